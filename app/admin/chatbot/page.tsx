@@ -59,8 +59,13 @@ export default function ChatbotAdminPage() {
 
   const handleReindex = async () => {
     try {
-      const res = await fetcher('/chatbot/reindex', { method: 'POST' });
-      alert(`Indexed ${res.indexed} chunks`);
+      let job = await fetcher('/chatbot/reindex', { method: 'POST' });
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        job = await fetcher(`/chatbot/reindex/${job.job_id}`);
+      }
+      if (job.status === 'failed') throw new Error(job.errors?.[0]);
+      alert(`Indexed ${job.indexed} chunks (${job.embedded} embedded, ${job.failed} failed)`);
     } catch (e) {
       alert('Failed to reindex');
     }
@@ -13,6 +13,7 @@ interface Category {
   name: string;
   image_url?: string;
   description?: string;
+  product_count?: number;
 }
 
 interface KeyProductsProps {
@@ -99,7 +100,7 @@ const KeyProducts = ({ products, categories }: KeyProductsProps) => {
             const image = cat.image_url || details.image;
             // Strip HTML tags for card description
             const desc = cat.description ? cat.description.replace(/<[^>]*>?/gm, '') : details.desc;
-            const productCount = products ? products.filter(p => p.category_id === cat.id).length : 0;
+            const productCount = (cat as Category).product_count ?? (products ? products.filter(p => p.category_id === cat.id).length : 0);
             
             return (
               <Link 
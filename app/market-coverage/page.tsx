@@ -9,18 +9,15 @@ export const metadata = {
 async function getCoverageData() {
   const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
   try {
-    const [regionsRes, citiesRes] = await Promise.all([
-      fetch(`${apiUrl}/regions`, { cache: 'no-store' }),
-      fetch(`${apiUrl}/cities`, { cache: 'no-store' })
-    ]);
+    // Regions with their cities nested, in one request
+    const res = await fetch(`${apiUrl}/coverage/tree`, { cache: 'no-store' });
     
-    if (!regionsRes.ok || !citiesRes.ok) return { regions: [], cities: [] };
+    if (!res.ok) return { regions: [] };
     
-    const regions = await regionsRes.json();
-    const cities = await citiesRes.json();
-    return { regions, cities };
+    const regions = await res.json();
+    return { regions };
   } catch (error) {
-    return { regions: [], cities: [] };
+    return { regions: [] };
   }
 }
 
@@ -57,11 +54,11 @@ interface RegionDisplay {
 }
 
 const MarketCoveragePage = async () => {
-  const { regions: dbRegions, cities: dbCities } = await getCoverageData();
+  const { regions: dbRegions } = await getCoverageData();
 
   // Fallback data if DB is empty
   const regions: RegionDisplay[] = dbRegions.length > 0 ? dbRegions.map((r: any, index: number) => {
-    const regionCities = dbCities.filter((c: any) => c.region_id === r.id);
+    const regionCities = r.cities;
     return {
       name: r.name,
       hub: regionCities.length > 0 ? regionCities[0].name : "Main Hub",
@@ -1,7 +1,7 @@
 'use client';
 
 import { useState, useEffect } from 'react';
-import { API_URL, fetcher } from '@/lib/api';
+import { API_URL, fetchPublished } from '@/lib/api';
 import SpecificationRequestModal from '@/app/components/SpecificationRequestModal';
 import { getFallbackImage, getPackingOptions } from '@/lib/productUtils';
 import Link from 'next/link';
@@ -38,7 +38,7 @@ export default function ProductDetailPage() {
     
     const fetchProduct = async () => {
       try {
-        const data = await fetcher(`/products/slug/${slug}`);
+        const data = await fetchPublished(`products/${slug}`, `/products/slug/${slug}`);
         setProduct(data);
         setActiveImage(data.image_url || getFallbackImage(data.name));
       } catch (err) {
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import shutil
+from contextlib import contextmanager
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Inverted-file (IVF) index over unit vectors, plus the versioned on-disk
+# layout that lets every worker memory-map the same vectors:
+#
+#   <base>/v<version>/matrix.npy      rows grouped by cluster
+#   <base>/v<version>/centroids.npy   (only when an IVF was built)
+#   <base>/v<version>/offsets.npy     row range of each cluster
+#   <base>/v<version>/meta.json       stamp and per-row metadata
+#   <base>/v<version>/texts.bin       row texts back to back (utf-8)
+#   <base>/v<version>/text_offsets.npy  byte range of each row's text
+#   <base>/CURRENT                    name of the live version
+
+KEEP_VERSIONS = 2
+
+class IVFIndex:
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray):
+        self.centroids = centroids
+        self.offsets = offsets
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def train(cls, matrix: np.ndarray, nlist: Optional[int] = None, iters: int = 15, sample: int = 64, seed: int = 0) -> Tuple["IVFIndex", np.ndarray]:
+        """Spherical k-means on a sample of the rows, then assign every row.
+        Returns the index and the row order that groups rows by cluster."""
+        n = matrix.shape[0]
+        nlist = nlist or max(1, min(4096, int(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        train_rows = matrix[rng.choice(n, size=min(n, nlist * sample), replace=False)]
+        centroids = train_rows[rng.choice(train_rows.shape[0], size=nlist, replace=False)].copy()
+        for _ in range(iters):
+            assign = np.argmax(train_rows @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train_rows)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            sums[empty] = centroids[empty]
+            norms[empty] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+        return cls(centroids, np.zeros(nlist + 1, dtype=np.int64)).regroup(cls.assign_rows(centroids, matrix))
+
+    @staticmethod
+    def assign_rows(centroids: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        assign = np.empty(matrix.shape[0], dtype=np.int64)
+        for start in range(0, matrix.shape[0], 8192):
+            assign[start:start + 8192] = np.argmax(matrix[start:start + 8192] @ centroids.T, axis=1)
+        return assign
+
+    def assign(self, matrix: np.ndarray) -> np.ndarray:
+        """Nearest centroid of each row, for rows added without retraining."""
+        return self.assign_rows(self.centroids, matrix)
+
+    def row_clusters(self) -> np.ndarray:
+        """Cluster of every row in the grouped layout."""
+        return np.repeat(np.arange(self.nlist), np.diff(self.offsets))
+
+    def regroup(self, assign: np.ndarray) -> Tuple["IVFIndex", np.ndarray]:
+        """Index over the same centroids for rows with these clusters, and the
+        row order that groups them."""
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=self.nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return IVFIndex(self.centroids, offsets), order
+
+    def probe(self, q: np.ndarray, nprobe: int) -> List[Tuple[int, int]]:
+        nprobe = min(nprobe, self.nlist)
+        scores = self.centroids @ q
+        lists = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        return [(int(self.offsets[i]), int(self.offsets[i + 1])) for i in lists if self.offsets[i + 1] > self.offsets[i]]
+
+    def candidates(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        ranges = self.probe(q, nprobe)
+        if not ranges:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.arange(s, e) for s, e in ranges])
+
+class TextColumn:
+    """Row texts read by offset from a memory-mapped texts.bin, so a worker
+    only holds the texts of the hits it returns."""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return self.offsets.shape[0] - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+def _save_texts(path: str, texts: Sequence[str]) -> None:
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    with open(os.path.join(path, "texts.bin"), "wb") as f:
+        for i, text in enumerate(texts):
+            data = text.encode("utf-8")
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    np.save(os.path.join(path, "text_offsets.npy"), offsets)
+
+def _load_texts(path: str, meta: dict):
+    if "texts" in meta:
+        # Versions written before texts.bin
+        return np.array(meta["texts"], dtype=object)
+    offsets = np.load(os.path.join(path, "text_offsets.npy"))
+    data = np.memmap(os.path.join(path, "texts.bin"), dtype=np.uint8, mode="r") if offsets[-1] else np.zeros(0, dtype=np.uint8)
+    return TextColumn(data, offsets)
+
+@contextmanager
+def exclusive(base_dir: str):
+    # One writer per host builds and switches versions at a time
+    os.makedirs(base_dir, exist_ok=True)
+    with open(os.path.join(base_dir, ".lock"), "w") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+def save(base_dir: str, matrix: np.ndarray, ivf: Optional[IVFIndex], meta: dict, texts: Sequence[str]) -> str:
+    os.makedirs(base_dir, exist_ok=True)
+    version = f"v{int(time.time() * 1000)}"
+    tmp = os.path.join(base_dir, f".{version}.tmp")
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "matrix.npy"), np.ascontiguousarray(matrix, dtype=np.float32))
+    if ivf is not None:
+        np.save(os.path.join(tmp, "centroids.npy"), ivf.centroids)
+        np.save(os.path.join(tmp, "offsets.npy"), ivf.offsets)
+    _save_texts(tmp, texts)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    path = os.path.join(base_dir, version)
+    os.rename(tmp, path)
+    current_tmp = os.path.join(base_dir, "CURRENT.tmp")
+    with open(current_tmp, "w") as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(base_dir, "CURRENT"))
+    _prune(base_dir, version)
+    return path
+
+def _prune(base_dir: str, current: str):
+    # Older versions may still be mapped by other workers; unlinking is safe on POSIX
+    versions = sorted(d for d in os.listdir(base_dir) if d.startswith("v") and d != current)
+    for old in versions[:max(0, len(versions) - (KEEP_VERSIONS - 1))]:
+        shutil.rmtree(os.path.join(base_dir, old), ignore_errors=True)
+
+def current_path(base_dir: str) -> Optional[str]:
+    try:
+        with open(os.path.join(base_dir, "CURRENT")) as f:
+            path = os.path.join(base_dir, f.read().strip())
+    except OSError:
+        return None
+    return path if os.path.isdir(path) else None
+
+def load(path: str) -> Tuple[np.ndarray, Optional[IVFIndex], dict, Sequence[str]]:
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    # Empty arrays cannot be memory-mapped
+    matrix = np.load(os.path.join(path, "matrix.npy"), mmap_mode="r" if meta.get("rows") else None)
+    ivf = None
+    if os.path.exists(os.path.join(path, "centroids.npy")):
+        ivf = IVFIndex(np.load(os.path.join(path, "centroids.npy")), np.load(os.path.join(path, "offsets.npy")))
+    return matrix, ivf, meta, _load_texts(path, meta)
@@ -0,0 +1,120 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence
+import numpy as np
+from http_cache import stamps
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+# Collections an answer can quote besides the indexed chunks (the fallback
+# context); a write to any of them on any worker retires cached answers
+ANSWER_SOURCES = ("content", "products", "knowledge")
+
+def answer_version(index_version) -> tuple:
+    return (index_version, stamps(*ANSWER_SOURCES))
+
+def normalize_question(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+class _Entry:
+    def __init__(self, payload: dict, vector: Optional[np.ndarray], version, expires_at: float):
+        self.payload = payload
+        self.vector = vector
+        self.version = version
+        self.expires_at = expires_at
+
+class AnswerCache:
+    """Grounded chatbot answers, looked up first by exact normalized question and
+    then by query-embedding similarity. Entries are tied to the vector index
+    version and source collection stamps they were produced against."""
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL_SECONDS, threshold: float = ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _live(self, entry: _Entry, version, now: float) -> bool:
+        return entry.version == version and entry.expires_at > now
+
+    def get(self, key: str, version) -> Optional[dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._live(entry, version, now):
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry.payload
+            if entry is not None:
+                del self._entries[key]
+        return None
+
+    def get_similar(self, query: Sequence[float], version) -> Optional[dict]:
+        q = np.asarray(query, dtype=np.float32)
+        n = float(np.linalg.norm(q))
+        now = time.monotonic()
+        with self._lock:
+            if n > 0:
+                keys, vectors = [], []
+                for key, entry in self._entries.items():
+                    if entry.vector is not None and entry.vector.shape == q.shape and self._live(entry, version, now):
+                        keys.append(key)
+                        vectors.append(entry.vector)
+                if vectors:
+                    scores = np.stack(vectors) @ (q / n)
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        self._entries.move_to_end(keys[best])
+                        self.semantic_hits += 1
+                        return self._entries[keys[best]].payload
+            self.misses += 1
+        return None
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(self, key: str, query: Optional[Sequence[float]], payload: dict, version):
+        vector = None
+        if query is not None:
+            v = np.asarray(query, dtype=np.float32)
+            n = float(np.linalg.norm(v))
+            vector = v / n if n > 0 else None
+        with self._lock:
+            self._entries[key] = _Entry(payload, vector, version, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "similarity_threshold": self.threshold,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "exact_hit_rate": round(self.exact_hits / lookups, 4) if lookups else 0.0,
+                "semantic_hit_rate": round(self.semantic_hits / lookups, 4) if lookups else 0.0,
+                "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+cache = AnswerCache()
@@ -0,0 +1,63 @@
+"""Recall and latency of the IVF index against exact search.
+
+Run from the backend directory:
+    python -m benchmarks.ann_benchmark [--rows 10000 50000] [--dim 768] [--queries 200]
+"""
+import argparse
+import time
+import numpy as np
+from ann_index import IVFIndex
+
+def synthetic_corpus(rows: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    # Clustered data is closer to real embeddings than uniform noise
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    data = centers[labels] + 0.6 * rng.normal(size=(rows, dim)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+def percentile_ms(samples, p) -> float:
+    return round(float(np.percentile(samples, p)) * 1000, 3)
+
+def run(rows: int, dim: int, queries: int, k: int, nprobes, rng: np.random.Generator):
+    matrix = synthetic_corpus(rows, dim, max(8, rows // 500), rng)
+    qs = matrix[rng.choice(rows, size=queries, replace=False)] + 0.3 * rng.normal(size=(queries, dim)).astype(np.float32)
+    qs = qs / np.linalg.norm(qs, axis=1, keepdims=True)
+
+    started = time.perf_counter()
+    ivf, order = IVFIndex.train(matrix)
+    build_s = time.perf_counter() - started
+    grouped = matrix[order]
+
+    exact_ids, exact_t = [], []
+    for q in qs:
+        t = time.perf_counter()
+        scores = grouped @ q
+        top = np.argpartition(-scores, k - 1)[:k]
+        exact_t.append(time.perf_counter() - t)
+        exact_ids.append(set(top.tolist()))
+    print(f"rows={rows} dim={dim} nlist={ivf.nlist} build={build_s:.2f}s")
+    print(f"  exact      p50={percentile_ms(exact_t, 50)}ms p95={percentile_ms(exact_t, 95)}ms")
+
+    for nprobe in nprobes:
+        recalls, times = [], []
+        for q, truth in zip(qs, exact_ids):
+            t = time.perf_counter()
+            rows_ = ivf.candidates(q, nprobe)
+            scores = grouped[rows_] @ q
+            kk = min(k, scores.shape[0])
+            top = rows_[np.argpartition(-scores, kk - 1)[:kk]]
+            times.append(time.perf_counter() - t)
+            recalls.append(len(truth & set(top.tolist())) / k)
+        print(f"  nprobe={nprobe:<4} recall@{k}={np.mean(recalls):.3f} p50={percentile_ms(times, 50)}ms p95={percentile_ms(times, 95)}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    for rows in args.rows:
+        run(rows, args.dim, args.queries, args.k, args.nprobe, rng)
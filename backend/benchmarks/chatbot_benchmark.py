@@ -0,0 +1,130 @@
+"""Latency, DB query counts and throughput of /chatbot/ask and reindex with
+the local fake provider, so no Gemini calls are made.
+
+Run from the backend directory:
+    python -m benchmarks.chatbot_benchmark [--sizes 100 1000 5000] [--asks 200] [--llm-latency-ms 0]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="chatbot-bench-")
+# Must be set before the app modules read them at import time
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}")
+os.environ.setdefault("ANN_INDEX_DIR", os.path.join(WORKDIR, "ann_index"))
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel
+import llm
+import main
+import indexer
+import context_snapshot
+import vector_index
+import bm25_index
+import answer_cache
+from database import engine, create_db_and_tables
+from models import Category, Product, SiteContent, ChatbotKnowledge
+
+WORDS = (
+    "petroleum jelly base oil wax paraffin bitumen grease lubricant solvent additive drum bulk "
+    "export import shipping warehouse quality grade industrial cosmetic pharmaceutical refinery "
+    "viscosity packaging tank supply contract delivery payment certificate inspection storage"
+).split()
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+def sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+def reset():
+    SQLModel.metadata.drop_all(engine)
+    create_db_and_tables()
+    vector_index.index.invalidate()
+    bm25_index.index.__init__()
+    answer_cache.cache.invalidate()
+    context_snapshot.store.invalidate()
+
+def seed(size: int, rng: random.Random):
+    with Session(engine) as session:
+        categories = [Category(name=f"Category {i}", slug=f"category-{i}") for i in range(max(1, size // 50))]
+        session.add_all(categories)
+        session.commit()
+        for i in range(size):
+            session.add(Product(
+                name=f"Product {i} {sentence(rng, 2)}", slug=f"product-{i}",
+                description=sentence(rng, 20), rich_description=f"<p>{sentence(rng, 120)}</p>",
+                category_id=categories[i % len(categories)].id,
+            ))
+        session.add(SiteContent(key="about", value="Trans Emirates trades " + sentence(rng, 40)))
+        for key in ("phone", "email", "address"):
+            session.add(SiteContent(key=key, value=sentence(rng, 4)))
+        for i in range(max(1, size // 10)):
+            session.add(SiteContent(key=f"section_{i}", value=sentence(rng, 60)))
+        for i in range(max(1, size // 2)):
+            session.add(ChatbotKnowledge(question=f"{sentence(rng, 6)}?", answer=sentence(rng, 30)))
+        session.commit()
+
+def percentiles(samples) -> str:
+    ms = np.array(samples) * 1000
+    return " ".join(f"p{p}={np.percentile(ms, p):.1f}ms" for p in (50, 95, 99))
+
+def bench_reindex(counter: QueryCounter, full: bool) -> str:
+    job, _ = indexer.start_job(full)
+    counter.count = 0
+    started = time.perf_counter()
+    indexer.run_reindex(job)
+    elapsed = time.perf_counter() - started
+    stats = job.to_dict()
+    return (
+        f"{elapsed:.2f}s queries={counter.count} embedded={stats['embedded']} "
+        f"unchanged={stats['unchanged']} chunks/s={stats['chunks_per_second']}"
+    )
+
+def bench_ask(client: TestClient, counter: QueryCounter, questions) -> str:
+    times, queries = [], []
+    started = time.perf_counter()
+    for q in questions:
+        counter.count = 0
+        t = time.perf_counter()
+        r = client.post("/chatbot/ask", json={"message": q})
+        times.append(time.perf_counter() - t)
+        queries.append(counter.count)
+        r.raise_for_status()
+    elapsed = time.perf_counter() - started
+    return f"{percentiles(times)} queries/req={np.mean(queries):.1f} throughput={len(questions) / elapsed:.1f} req/s"
+
+def run(size: int, asks: int, client: TestClient, counter: QueryCounter, rng: random.Random):
+    reset()
+    seed(size, rng)
+    print(f"products={size} content={size // 10 + 4} knowledge={max(1, size // 2)}")
+    print(f"  reindex full     {bench_reindex(counter, True)}")
+    print(f"  reindex no-op    {bench_reindex(counter, False)}")
+    questions = [sentence(rng, 5) for _ in range(asks)]
+    print(f"  ask cold         {bench_ask(client, counter, questions)}")
+    print(f"  ask repeated     {bench_ask(client, counter, questions)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--asks", type=int, default=200)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    llm.set_provider(llm.FakeProvider(embed_latency_ms=args.embed_latency_ms, generate_latency_ms=args.llm_latency_ms))
+    counter = QueryCounter()
+    client = TestClient(main.app)
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        run(size, args.asks, client, counter, rng)
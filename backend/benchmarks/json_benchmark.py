@@ -0,0 +1,85 @@
+"""Response time of a large product list: ORM instances validated against
+response_model and encoded with json (the old handlers) versus plain row
+tuples in FastJSONResponse, with the standard json encoder and with orjson.
+
+Run from the backend directory:
+    python -m benchmarks.json_benchmark [--sizes 1000 10000 100000] [--repeat 10]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="json-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}")
+
+import numpy as np
+from typing import List
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel, select
+import fast_json
+from database import engine, get_session, create_db_and_tables
+from models import Product
+
+WORDS = "petroleum jelly base oil wax paraffin bitumen grease lubricant solvent additive drum bulk export".split()
+
+app = FastAPI()
+
+@app.get("/orm", response_model=List[Product])
+def orm_list(session: Session = Depends(get_session)):
+    return session.exec(select(Product).order_by(Product.id)).all()
+
+@app.get("/rows")
+def rows_list(session: Session = Depends(get_session)):
+    return fast_json.FastJSONResponse(fast_json.list_rows(session, Product, Product.id))
+
+def seed(size: int, rng: random.Random):
+    SQLModel.metadata.drop_all(engine)
+    create_db_and_tables()
+    sentence = lambda n: " ".join(rng.choice(WORDS) for _ in range(n))
+    with Session(engine) as session:
+        for start in range(0, size, 5000):
+            session.execute(insert(Product), [
+                {
+                    "name": f"Product {i}", "slug": f"product-{i}", "description": sentence(20),
+                    "rich_description": f"<p>{sentence(80)}</p>", "price": round(rng.uniform(1, 500), 2),
+                    "stock_status": "in_stock", "is_active": True,
+                }
+                for i in range(start, min(size, start + 5000))
+            ])
+        session.commit()
+
+def bench(client: TestClient, path: str, repeat: int, use_orjson: bool):
+    fast_json.FAST_JSON_ENABLED = use_orjson
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        r = client.get(path)
+        times.append(time.perf_counter() - t)
+        r.raise_for_status()
+    ms = np.array(times) * 1000
+    return r, f"p50={np.percentile(ms, 50):.1f}ms p95={np.percentile(ms, 95):.1f}ms bytes={len(r.content)}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if fast_json.orjson is None:
+        print("orjson is not installed; the orjson rows fall back to the json encoder")
+    client = TestClient(app)
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        seed(size, rng)
+        print(f"products={size}")
+        baseline, line = bench(client, "/orm", args.repeat, True)
+        print(f"  orm + response_model + json  {line}")
+        rows, line = bench(client, "/rows", args.repeat, False)
+        print(f"  rows + json                  {line}")
+        fast, line = bench(client, "/rows", args.repeat, True)
+        print(f"  rows + orjson                {line}")
+        assert baseline.json() == rows.json() == fast.json(), "fast path output differs"
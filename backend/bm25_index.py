@@ -0,0 +1,128 @@
+import os
+import re
+import math
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+from sqlmodel import Session, select
+from models import EmbeddingDocument
+from vector_index import corpus_stamp
+
+# Inverted index with BM25 scoring over the same chunks as embedding_documents.
+# It refreshes when the corpus stamp shared with the vector index changes, by
+# diffing each row's updated_at against the one it indexed, so a reindex only
+# re-tokenizes the rows it wrote whatever order they were committed in. It
+# needs no network call at query time.
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+BM25_MIN_SCORE = float(os.getenv("BM25_MIN_SCORE", "1.0"))
+# Changed rows are read back in batches of this many ids
+BM25_FETCH_BATCH = 500
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "is", "are", "was", "were",
+    "be", "by", "at", "as", "it", "its", "this", "that", "these", "those", "from", "do", "does", "you",
+    "your", "we", "our", "i", "me", "my", "what", "which", "who", "how", "can", "please", "about",
+}
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS]
+
+class BM25Index:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_len: Dict[int, int] = {}
+        self.docs: Dict[int, tuple] = {}
+        # doc_id -> updated_at of the indexed text
+        self.versions: Dict[int, datetime] = {}
+        self.total_len = 0
+        self.stamp: Optional[tuple] = None
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _remove(self, doc_id: int):
+        if doc_id not in self.docs:
+            return
+        for term in set(tokenize(self.docs[doc_id][2])):
+            plist = self.postings.get(term)
+            if plist is not None:
+                plist.pop(doc_id, None)
+                if not plist:
+                    del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id)
+        del self.docs[doc_id]
+        self.versions.pop(doc_id, None)
+
+    def _add(self, doc_id: int, source_type: str, source_id: Optional[str], text: str):
+        self._remove(doc_id)
+        tokens = tokenize(text)
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.doc_len[doc_id] = len(tokens)
+        self.total_len += len(tokens)
+        self.docs[doc_id] = (source_type, source_id, text)
+
+    def ensure_fresh(self, session: Session, stamp: Optional[tuple] = None) -> None:
+        """Catch up with embedding_documents; pass the corpus_stamp already taken
+        for the vector index to skip a second aggregate."""
+        stamp = stamp if stamp is not None else corpus_stamp(session)
+        if stamp == self.stamp:
+            return
+        with self._lock:
+            if stamp == self.stamp:
+                return
+            live = dict(session.exec(select(EmbeddingDocument.id, EmbeddingDocument.updated_at)).all())
+            for doc_id in [d for d in self.docs if d not in live]:
+                self._remove(doc_id)
+            changed = [doc_id for doc_id, updated_at in live.items() if self.versions.get(doc_id) != updated_at]
+            for start in range(0, len(changed), BM25_FETCH_BATCH):
+                rows = session.exec(
+                    select(
+                        EmbeddingDocument.id, EmbeddingDocument.source_type, EmbeddingDocument.source_id, EmbeddingDocument.text,
+                    ).where(EmbeddingDocument.id.in_(changed[start:start + BM25_FETCH_BATCH]))
+                ).all()
+                for doc_id, source_type, source_id, text in rows:
+                    self._add(doc_id, source_type, source_id, text)
+                    self.versions[doc_id] = live[doc_id]
+            self.stamp = stamp
+
+    def search(self, query: str, k: int = 5, source_types: Optional[Sequence[str]] = None, min_score: float = BM25_MIN_SCORE) -> List[dict]:
+        terms = set(tokenize(query))
+        n = len(self.docs)
+        if not terms or n == 0:
+            return []
+        avgdl = self.total_len / n or 1.0
+        scores: Dict[int, float] = {}
+        with self._lock:
+            for term in terms:
+                plist = self.postings.get(term)
+                if not plist:
+                    continue
+                idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+                for doc_id, tf in plist.items():
+                    if source_types is not None and self.docs[doc_id][0] not in source_types:
+                        continue
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[doc_id] / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+            ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]
+            return [
+                {"score": s, "doc_id": doc_id, "source_type": self.docs[doc_id][0], "source_id": self.docs[doc_id][1], "text": self.docs[doc_id][2]}
+                for doc_id, s in ranked if s >= min_score
+            ]
+
+def reciprocal_rank_fusion(result_lists: Sequence[List[dict]], k: int = 5, rrf_k: int = 60) -> List[dict]:
+    """Merge ranked hit lists by sum of 1 / (rrf_k + rank), keyed on doc_id."""
+    fused: Dict[int, float] = {}
+    hits: Dict[int, dict] = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results):
+            fused[hit["doc_id"]] = fused.get(hit["doc_id"], 0.0) + 1.0 / (rrf_k + rank + 1)
+            hits.setdefault(hit["doc_id"], hit)
+    ranked = sorted(fused.items(), key=lambda x: x[1], reverse=True)[:k]
+    return [{**hits[doc_id], "score": s} for doc_id, s in ranked]
+
+index = BM25Index()
@@ -0,0 +1,192 @@
+import io
+import os
+import csv
+import json
+from typing import Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlmodel import SQLModel, Session, select
+from database import engine
+from models import Category, Product
+import product_search
+
+# Bulk product import (CSV or JSONL, upsert by slug) and streaming export in
+# the same format, so an export can be fed straight back in.
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+MAX_REPORTED_ERRORS = 1000
+
+COLUMNS = [
+    "slug", "name", "description", "rich_description", "image_url", "images", "price",
+    "stock_status", "is_active", "seo_title", "seo_description", "category_slug", "category_name",
+]
+PRODUCT_COLUMNS = [c for c in COLUMNS if not c.startswith("category_")]
+
+class ProductRow(SQLModel):
+    slug: str
+    name: str
+    description: Optional[str] = None
+    rich_description: Optional[str] = None
+    image_url: Optional[str] = None
+    images: Optional[str] = None
+    price: Optional[float] = None
+    stock_status: str = "in_stock"
+    is_active: bool = True
+    seo_title: Optional[str] = None
+    seo_description: Optional[str] = None
+    category_slug: Optional[str] = None
+    category_name: Optional[str] = None
+
+class ImportReport:
+    def __init__(self):
+        self.received = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.categories_created = 0
+        self.errors: List[dict] = []
+
+    def error(self, row: int, slug: Optional[str], message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "slug": slug, "error": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "received": self.received,
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "categories_created": self.categories_created,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+def read_rows(stream, fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """(row number, raw dict or None, parse error) from a binary file object."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        for n, raw in enumerate(csv.DictReader(text), start=1):
+            # Empty CSV cells mean "not set"
+            yield n, {k: v for k, v in raw.items() if k and v not in ("", None)}, None
+        return
+    for n, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as e:
+            yield n, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(raw, dict):
+            yield n, None, "Expected a JSON object"
+            continue
+        yield n, raw, None
+
+def _category_ids(session: Session, rows: List[Tuple[int, ProductRow]], report: ImportReport) -> dict:
+    slugs = {r.category_slug for _, r in rows if r.category_slug}
+    if not slugs:
+        return {}
+    ids = {c.slug: c.id for c in session.exec(select(Category).where(Category.slug.in_(slugs))).all()}
+    missing = [(s, next(r.category_name for _, r in rows if r.category_slug == s)) for s in slugs if s not in ids]
+    for slug, name in missing:
+        category = Category(slug=slug, name=name or slug.replace("-", " ").title())
+        session.add(category)
+        session.flush()
+        ids[slug] = category.id
+        report.categories_created += 1
+    return ids
+
+def _upsert(session: Session, rows: List[Tuple[int, ProductRow]], report: ImportReport) -> Tuple[int, int, List[int]]:
+    created = updated = 0
+    categories = _category_ids(session, rows, report)
+    existing = {p.slug: p for p in session.exec(select(Product).where(Product.slug.in_([r.slug for _, r in rows]))).all()}
+    touched = []
+    for _, row in rows:
+        product = existing.get(row.slug)
+        if product is None:
+            product = Product(slug=row.slug, name=row.name)
+            existing[row.slug] = product
+            created += 1
+        else:
+            updated += 1
+        data = row.dict(exclude_unset=True)
+        for key in PRODUCT_COLUMNS:
+            if key in data:
+                setattr(product, key, data[key])
+        if row.category_slug:
+            product.category_id = categories[row.category_slug]
+        session.add(product)
+        touched.append(product)
+    session.flush()
+    return created, updated, [p.id for p in touched]
+
+def _apply_batch(session: Session, rows: List[Tuple[int, ProductRow]], report: ImportReport):
+    categories_before = report.categories_created
+    try:
+        created, updated, ids = _upsert(session, rows, report)
+        session.commit()
+    except Exception:
+        session.rollback()
+        report.categories_created = categories_before
+        # Find the offending rows one at a time; the rest still go in
+        created = updated = 0
+        ids = []
+        for n, row in rows:
+            try:
+                with session.begin_nested():
+                    c, u, i = _upsert(session, [(n, row)], report)
+                created, updated, ids = created + c, updated + u, ids + i
+            except Exception as e:
+                report.error(n, row.slug, str(getattr(e, "orig", e)))
+        session.commit()
+    report.created += created
+    report.updated += updated
+    product_search.index_products(session, ids)
+
+def import_products(stream, fmt: str, batch_size: int = BULK_BATCH_SIZE) -> ImportReport:
+    report = ImportReport()
+    batch: List[Tuple[int, ProductRow]] = []
+    with Session(engine) as session:
+        for n, raw, problem in read_rows(stream, fmt):
+            report.received += 1
+            if problem:
+                report.error(n, None, problem)
+                continue
+            try:
+                row = ProductRow(**raw)
+            except ValidationError as e:
+                report.error(n, raw.get("slug"), "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+                continue
+            batch.append((n, row))
+            if len(batch) >= batch_size:
+                _apply_batch(session, batch, report)
+                batch = []
+        if batch:
+            _apply_batch(session, batch, report)
+    return report
+
+def export_products(fmt: str, chunk_rows: int = 200) -> Iterator[str]:
+    """Yield the catalog as CSV or JSONL text, a few hundred rows per chunk,
+    reading the products with a server-side cursor."""
+    columns = [getattr(Product, c) for c in PRODUCT_COLUMNS]
+    query = (
+        select(*columns, Category.slug, Category.name)
+        .outerjoin(Category, Category.id == Product.category_id)
+        .order_by(Product.id)
+        .execution_options(yield_per=chunk_rows)
+    )
+    buf = io.StringIO()
+    writer = csv.writer(buf) if fmt == "csv" else None
+    if writer:
+        writer.writerow(COLUMNS)
+    with Session(engine) as session:
+        for n, row in enumerate(session.exec(query), start=1):
+            if writer:
+                writer.writerow(["" if v is None else v for v in row])
+            else:
+                buf.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + "\n")
+            if n % chunk_rows == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+    yield buf.getvalue()
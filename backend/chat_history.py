@@ -0,0 +1,67 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from sqlmodel import Session, select
+from models import ChatSession, ChatMessage
+
+# Turns of conversation (including the new question) shown to the model
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "6"))
+# Sessions whose recent turns are kept in memory; 0 disables the cache.
+# Only safe to enable when a session's requests stick to one worker.
+CHAT_HISTORY_CACHE_SIZE = int(os.getenv("CHAT_HISTORY_CACHE_SIZE", "0"))
+
+class RecentHistoryCache:
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self._items: "OrderedDict[str, List[Tuple[str, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid: str) -> Optional[List[Tuple[str, str]]]:
+        with self._lock:
+            turns = self._items.get(sid)
+            if turns is not None:
+                self._items.move_to_end(sid)
+            return turns
+
+    def put(self, sid: str, turns: List[Tuple[str, str]]):
+        if self.max_sessions <= 0:
+            return
+        with self._lock:
+            self._items[sid] = turns[-CHAT_HISTORY_TURNS:]
+            self._items.move_to_end(sid)
+            while len(self._items) > self.max_sessions:
+                self._items.popitem(last=False)
+
+    def discard(self, sids):
+        with self._lock:
+            for sid in sids:
+                self._items.pop(sid, None)
+
+cache = RecentHistoryCache(CHAT_HISTORY_CACHE_SIZE)
+
+def load_history(session: Session, sid: str) -> Tuple[List[Tuple[str, str]], bool]:
+    """Return the last (role, content) turns before the new question and whether
+    the session already exists. One indexed, limited read on a cache miss."""
+    cached = cache.get(sid)
+    if cached is not None:
+        return list(cached), True
+    rows = session.exec(
+        select(ChatMessage.role, ChatMessage.content)
+        .where(ChatMessage.session_id == sid)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(max(0, CHAT_HISTORY_TURNS - 1))
+    ).all()
+    turns = [(role, content) for role, content in reversed(rows)]
+    exists = bool(turns) or session.exec(select(ChatSession.id).where(ChatSession.session_id == sid)).first() is not None
+    return turns, exists
+
+def save_exchange(session: Session, sid: str, prior: List[Tuple[str, str]], messages: List[ChatMessage], new_session: bool):
+    # Session row, question and answer go out in a single transaction
+    if new_session:
+        session.add(ChatSession(session_id=sid))
+    turns = [(m.role, m.content) for m in messages]
+    for m in messages:
+        session.add(m)
+    session.commit()
+    cache.put(sid, prior + turns)
@@ -0,0 +1,238 @@
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import delete, func, text
+from sqlmodel import Session, select
+from database import engine
+from models import ChatSession, ChatMessage
+from chat_history import cache as history_cache
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Sessions idle for longer than the TTL are removed, and sessions over the cap
+# lose their oldest messages. Removed rows are appended to a gzipped JSONL
+# archive first (one session per line) unless CHAT_ARCHIVE_DIR is empty.
+
+CHAT_RETENTION_DAYS = float(os.getenv("CHAT_RETENTION_DAYS", "90"))
+CHAT_SESSION_MAX_MESSAGES = int(os.getenv("CHAT_SESSION_MAX_MESSAGES", "200"))
+CHAT_ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR", "data/chat_archive")
+CHAT_RETENTION_BATCH = int(os.getenv("CHAT_RETENTION_BATCH", "500"))
+# 0 disables the scheduled run; the admin endpoint still works
+CHAT_RETENTION_INTERVAL_HOURS = float(os.getenv("CHAT_RETENTION_INTERVAL_HOURS", "24"))
+# Every worker's scheduler checks this often whether a run is due; the lock
+# file (which also records the last scheduled run) lets only one of them run it
+CHAT_RETENTION_POLL_SECONDS = 300
+CHAT_RETENTION_LOCK = os.getenv("CHAT_RETENTION_LOCK", "data/chat_retention.lock")
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+@contextmanager
+def _exclusive():
+    """Yields the open lock file while this is the only run on the host, or
+    None when a run holds it in this or another worker."""
+    if not _lock.acquire(blocking=False):
+        yield None
+        return
+    try:
+        os.makedirs(os.path.dirname(CHAT_RETENTION_LOCK) or ".", exist_ok=True)
+        with open(CHAT_RETENTION_LOCK, "a+") as f:
+            if fcntl:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    f = None
+            yield f
+    finally:
+        _lock.release()
+
+def _last_run(f) -> float:
+    f.seek(0)
+    try:
+        return float(f.read().strip() or 0)
+    except ValueError:
+        return 0.0
+
+def table_counts(session: Session) -> dict:
+    return {
+        "chat_sessions": session.exec(select(func.count(ChatSession.id))).one(),
+        "chat_messages": session.exec(select(func.count(ChatMessage.id))).one(),
+    }
+
+def database_bytes(session: Session) -> Optional[int]:
+    if engine.dialect.name == "sqlite":
+        pages = session.execute(text("PRAGMA page_count")).scalar()
+        free = session.execute(text("PRAGMA freelist_count")).scalar()
+        return (pages - free) * session.execute(text("PRAGMA page_size")).scalar()
+    if engine.dialect.name == "postgresql":
+        return session.execute(text(
+            "SELECT pg_total_relation_size('chat_messages') + pg_total_relation_size('chat_sessions')"
+        )).scalar()
+    return None
+
+def _message_dict(m: ChatMessage) -> dict:
+    return {"role": m.role, "content": m.content, "created_at": m.created_at.isoformat()}
+
+class RetentionRun:
+    def __init__(self, dry_run: bool):
+        self.dry_run = dry_run
+        self.sessions_deleted = 0
+        self.messages_deleted = 0
+        self.messages_trimmed = 0
+        self.sessions_trimmed = 0
+        self.archive_path: Optional[str] = None
+        self._archive = None
+
+    def archive(self, records: List[dict]):
+        if not CHAT_ARCHIVE_DIR or self.dry_run or not records:
+            return
+        if self._archive is None:
+            os.makedirs(CHAT_ARCHIVE_DIR, exist_ok=True)
+            self.archive_path = os.path.join(CHAT_ARCHIVE_DIR, f"chat-archive-{datetime.utcnow():%Y%m%dT%H%M%S}.jsonl.gz")
+            self._archive = gzip.open(self.archive_path, "at", encoding="utf-8")
+        for record in records:
+            self._archive.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # Archived rows must be on disk before their delete commits
+        self._archive.flush()
+
+    def close(self):
+        if self._archive is not None:
+            self._archive.close()
+
+def _expire_sessions(session: Session, run: RetentionRun, cutoff: datetime):
+    # Keyset pages of sessions; the last message time is grouped only over the
+    # page's sessions, through the (session_id, created_at) index
+    after_id = 0
+    while True:
+        page = session.exec(
+            select(ChatSession.id, ChatSession.session_id, ChatSession.created_at)
+            .where(ChatSession.id > after_id).order_by(ChatSession.id).limit(CHAT_RETENTION_BATCH)
+        ).all()
+        if not page:
+            return
+        after_id = page[-1][0]
+        last_at = dict(session.exec(
+            select(ChatMessage.session_id, func.max(ChatMessage.created_at))
+            .where(ChatMessage.session_id.in_([sid for _, sid, _ in page])).group_by(ChatMessage.session_id)
+        ).all())
+        rows = [r for r in page if last_at.get(r[1], r[2]) < cutoff]
+        if not rows:
+            continue
+        sids = [sid for _, sid, _ in rows]
+        messages = session.exec(
+            select(ChatMessage).where(ChatMessage.session_id.in_(sids)).order_by(ChatMessage.created_at, ChatMessage.id)
+        ).all()
+        by_sid = {}
+        for m in messages:
+            by_sid.setdefault(m.session_id, []).append(_message_dict(m))
+        run.archive([
+            {"session_id": sid, "created_at": created_at.isoformat(), "messages": by_sid.get(sid, [])}
+            for _, sid, created_at in rows
+        ])
+        run.sessions_deleted += len(rows)
+        run.messages_deleted += len(messages)
+        if run.dry_run:
+            continue
+        session.execute(delete(ChatMessage).where(ChatMessage.session_id.in_(sids)))
+        session.execute(delete(ChatSession).where(ChatSession.id.in_([r[0] for r in rows])))
+        session.commit()
+        history_cache.discard(sids)
+
+def _trim_sessions(session: Session, run: RetentionRun, cap: int):
+    over = session.exec(
+        select(ChatMessage.session_id).group_by(ChatMessage.session_id).having(func.count(ChatMessage.id) > cap)
+    ).all()
+    for i in range(0, len(over), CHAT_RETENTION_BATCH):
+        sids = over[i:i + CHAT_RETENTION_BATCH]
+        records, ids = [], []
+        for sid in sids:
+            old = session.exec(
+                select(ChatMessage).where(ChatMessage.session_id == sid)
+                .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).offset(cap)
+            ).all()
+            records.append({"session_id": sid, "trimmed": True, "messages": [_message_dict(m) for m in reversed(old)]})
+            ids.extend(m.id for m in old)
+        run.archive(records)
+        run.sessions_trimmed += len(sids)
+        run.messages_trimmed += len(ids)
+        if run.dry_run:
+            continue
+        for j in range(0, len(ids), 500):
+            session.execute(delete(ChatMessage).where(ChatMessage.id.in_(ids[j:j + 500])))
+        session.commit()
+        history_cache.discard(sids)
+
+def run_retention(dry_run: bool = False, vacuum: bool = False, days: float = CHAT_RETENTION_DAYS, cap: int = CHAT_SESSION_MAX_MESSAGES, every: float = 0) -> Optional[dict]:
+    """Expire idle sessions and trim long ones. Returns None if a run is already
+    in progress in any worker, or if every > 0 and the last run that passed it
+    finished less than that many seconds ago."""
+    with _exclusive() as lock:
+        if lock is None or (every > 0 and time.time() - _last_run(lock) < every):
+            return None
+        report = _run(dry_run, vacuum, days, cap)
+        if every > 0:
+            lock.seek(0)
+            lock.truncate()
+            lock.write(str(time.time()))
+            lock.flush()
+        return report
+
+def _run(dry_run: bool, vacuum: bool, days: float, cap: int) -> dict:
+    started = time.perf_counter()
+    run = RetentionRun(dry_run)
+    with Session(engine) as session:
+        before = table_counts(session)
+        bytes_before = database_bytes(session)
+        try:
+            if days > 0:
+                _expire_sessions(session, run, datetime.utcnow() - timedelta(days=days))
+            if cap > 0:
+                _trim_sessions(session, run, cap)
+        finally:
+            run.close()
+        if vacuum and not dry_run and engine.dialect.name == "sqlite":
+            session.commit()
+            with engine.connect() as conn:
+                conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        bytes_after = database_bytes(session)
+        after = table_counts(session)
+    return {
+        "dry_run": dry_run,
+        "sessions_deleted": run.sessions_deleted,
+        "messages_deleted": run.messages_deleted,
+        "sessions_trimmed": run.sessions_trimmed,
+        "messages_trimmed": run.messages_trimmed,
+        "rows_before": before,
+        "rows_after": after,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "bytes_reclaimed": bytes_before - bytes_after if bytes_before is not None and bytes_after is not None else None,
+        "archive_path": run.archive_path,
+        "archive_bytes": os.path.getsize(run.archive_path) if run.archive_path else 0,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+
+def _schedule_loop(interval: float):
+    # First check shortly after startup, so frequent restarts don't starve it
+    delay = 60.0
+    while True:
+        time.sleep(delay)
+        try:
+            run_retention(every=interval)
+        except Exception:
+            logger.exception("Chat retention failed")
+        delay = min(interval, CHAT_RETENTION_POLL_SECONDS)
+
+def start_scheduler():
+    if CHAT_RETENTION_INTERVAL_HOURS > 0:
+        threading.Thread(target=_schedule_loop, args=(CHAT_RETENTION_INTERVAL_HOURS * 3600,), daemon=True, name="chat-retention").start()
@@ -0,0 +1,85 @@
+import os
+import time
+import threading
+from typing import Dict, List, Optional
+from sqlmodel import Session, select
+from models import SiteContent, Product, ChatbotKnowledge
+from http_cache import stamps
+
+# Prompt context used when retrieval finds nothing. Built once from site
+# content, active products and (optionally) knowledge, trimmed to a token
+# budget, and rebuilt when the shared version stamp of one of those collections
+# moves (a write on any worker) or when the TTL lapses.
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_SNAPSHOT_TTL_SECONDS = float(os.getenv("CONTEXT_SNAPSHOT_TTL_SECONDS", "300"))
+CONTEXT_SOURCES = ("content", "products", "knowledge")
+# Site content keys that go into the prompt before anything else
+PRIORITY_KEYS = ["about", "tagline", "phone", "email", "address", "contact"]
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+class Snapshot:
+    def __init__(self, version: tuple, content: Dict[str, str], texts: Dict[bool, str], tokens: Dict[bool, int], built_at: float):
+        self.version = version
+        self.content = content
+        self.texts = texts
+        self.tokens = tokens
+        self.built_at = built_at
+
+def _pack(sections: List[tuple], budget: int) -> tuple:
+    """Take lines in priority order while they fit, then render the sections."""
+    used = 0
+    kept: Dict[str, List[str]] = {}
+    for title, line in sections:
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            continue
+        used += cost
+        kept.setdefault(title, []).append(line)
+    parts = []
+    for title, sep in (("SITE CONTENT", "\n"), ("PRODUCTS", "\n"), ("KNOWLEDGE", "\n\n")):
+        if kept.get(title):
+            parts.append(f"{title}:\n" + sep.join(kept[title]))
+    return "\n\n".join(parts), used
+
+class ContextSnapshotStore:
+    def __init__(self, budget: int = CONTEXT_TOKEN_BUDGET, ttl: float = CONTEXT_SNAPSHOT_TTL_SECONDS):
+        self.budget = budget
+        self.ttl = ttl
+        self._snapshot: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def get(self, session: Session) -> Snapshot:
+        version = stamps(*CONTEXT_SOURCES)
+        snap = self._snapshot
+        if snap is not None and snap.version == version and time.monotonic() - snap.built_at < self.ttl:
+            return snap
+        return self._build(session, version)
+
+    def _build(self, session: Session, version: tuple) -> Snapshot:
+        content = {c.key: c.value for c in session.exec(select(SiteContent)).all()}
+        products = session.exec(
+            select(Product.name, Product.description).where(Product.is_active == True).order_by(Product.id)
+        ).all()
+        kb = session.exec(
+            select(ChatbotKnowledge.question, ChatbotKnowledge.answer).where(ChatbotKnowledge.is_active == True).order_by(ChatbotKnowledge.id)
+        ).all()
+        keys = [k for k in PRIORITY_KEYS if k in content] + [k for k in content if k not in PRIORITY_KEYS]
+        base = [("SITE CONTENT", f"{k}: {content[k]}") for k in keys]
+        base += [("PRODUCTS", f"{name}: {description or ''}") for name, description in products]
+        texts, tokens = {}, {}
+        texts[False], tokens[False] = _pack(base, self.budget)
+        texts[True], tokens[True] = _pack(base + [("KNOWLEDGE", f"Q: {q}\nA: {a}") for q, a in kb], self.budget)
+        snap = Snapshot(version, content, texts, tokens, time.monotonic())
+        with self._lock:
+            self._snapshot = snap
+        return snap
+
+store = ContextSnapshotStore()
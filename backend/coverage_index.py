@@ -0,0 +1,148 @@
+import re
+import threading
+import unicodedata
+from typing import List, Optional, Set, Tuple
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+from models import Region
+from http_cache import versions
+
+# In-memory prefix index over region and city names for "do we cover X"
+# lookups while typing. Names are indexed twice: by their normalized spelling
+# (case, accents and Arabic letter variants folded, leading "al"/"ال" optional)
+# and by a consonant skeleton shared by Arabic script and the usual Latin
+# transliterations, so "Jeddah", "Jiddah" and "جدة" meet on the same key. The
+# index is rebuilt when the regions or cities version stamp changes.
+
+COVERAGE_COLLECTIONS = ("regions", "cities")
+
+ARABIC_MARKS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+ARABIC_FOLD = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه", "ؤ": "و", "ئ": "ي"})
+# Arabic consonants to the Latin letters used for them in place names; long
+# vowels, hamza and ayn carry no consonant
+ARABIC_LATIN = {
+    "ب": "b", "ت": "t", "ث": "t", "ج": "j", "ح": "h", "خ": "k", "د": "d", "ذ": "d", "ر": "r", "ز": "z",
+    "س": "s", "ش": "s", "ص": "s", "ض": "d", "ط": "t", "ظ": "z", "غ": "g", "ف": "f", "ق": "k", "ك": "k",
+    "ل": "l", "م": "m", "ن": "n", "ه": "h", "گ": "g", "پ": "b", "چ": "j", "ڤ": "f",
+}
+LATIN_DIGRAPHS = (("sh", "s"), ("th", "t"), ("kh", "k"), ("dh", "d"), ("gh", "g"), ("ph", "f"))
+LATIN_FOLD = str.maketrans({"c": "k", "q": "k", "x": "k"})
+ARTICLES = ("al", "el", "ال")
+MIN_SOUND_KEY = 2
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = ARABIC_MARKS.sub("", text).translate(ARABIC_FOLD)
+    # Strip Latin accents but leave Arabic letters alone
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", text.replace("-", " ")))
+
+def words(text: str) -> List[str]:
+    """Normalized words without the definite article, standalone ("Al Jouf")
+    or attached in Arabic ("الجوف")."""
+    result = []
+    for w in normalize(text).split():
+        if w in ARTICLES:
+            continue
+        result.append(w[2:] if w.startswith("ال") and len(w) > 3 else w)
+    return result
+
+def skeleton(word: str) -> str:
+    """Consonant key: Arabic letters transliterated, vowels dropped, repeats
+    collapsed, a final h dropped (Jeddah, Jidda and جدة all give "jd")."""
+    if any("\u0600" <= c <= "\u06ff" for c in word):
+        # A leading waw or ya is a consonant (Wadi, Yanbu)
+        lead = {"و": "w", "ي": "y"}.get(word[0], "")
+        word = lead + "".join(ARABIC_LATIN.get(c, "") for c in word[1 if lead else 0:])
+    else:
+        for digraph, letter in LATIN_DIGRAPHS:
+            word = word.replace(digraph, letter)
+        word = word.translate(LATIN_FOLD)
+        word = word[:1] + re.sub(r"[aeiouyw]", "", word[1:]) if word[:1] in ("w", "y") else re.sub(r"[aeiouyw]", "", word)
+    word = re.sub(r"(.)\1+", r"\1", word)
+    if len(word) > 1 and word.endswith("h"):
+        word = word[:-1]
+    return word
+
+class PrefixTrie:
+    def __init__(self):
+        self.root: dict = {}
+
+    def add(self, key: str, ref: int):
+        # Every node on the path keeps the refs below it, so a lookup is one walk
+        node = self.root
+        for ch in key:
+            node = node.setdefault(ch, {})
+            node.setdefault(None, set()).add(ref)
+
+    def find(self, prefix: str) -> Set[int]:
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return set()
+        return node.get(None, set())
+
+class CoverageIndex:
+    def __init__(self, regions: List[Region]):
+        # entries: (type, id, name, region_id, region name)
+        self.entries: List[Tuple[str, int, str, Optional[int], Optional[str]]] = []
+        self.normalized: List[str] = []
+        self.exact = PrefixTrie()
+        self.sounds = PrefixTrie()
+        for region in regions:
+            self._add("region", region.id, region.name, region.id, region.name)
+            for city in region.cities:
+                self._add("city", city.id, city.name, region.id, region.name)
+
+    def _add(self, kind: str, id: int, name: str, region_id: Optional[int], region: Optional[str]):
+        ref = len(self.entries)
+        self.entries.append((kind, id, name, region_id, region))
+        tokens = words(name)
+        self.normalized.append(" ".join(tokens))
+        # Any word may start the match: "jouf" finds "Al Jouf"
+        for i in range(len(tokens)):
+            self.exact.add(" ".join(tokens[i:]), ref)
+            self.sounds.add("".join(skeleton(t) for t in tokens[i:]), ref)
+
+    def lookup(self, q: str, limit: int = 10) -> List[dict]:
+        tokens = words(q)
+        if not tokens:
+            return []
+        exact = self.exact.find(" ".join(tokens))
+        key = "".join(skeleton(t) for t in tokens)
+        # One consonant matches too much to be useful
+        sounds = self.sounds.find(key) - exact if len(key) >= MIN_SOUND_KEY else set()
+        query = " ".join(tokens)
+        # Whole-name prefixes first, then word prefixes, then sound-alikes; cities before regions
+        ranked = sorted(exact, key=lambda r: (not self.normalized[r].startswith(query), self.entries[r][0] != "city", len(self.normalized[r]), r))
+        ranked += sorted(sounds, key=lambda r: (self.entries[r][0] != "city", len(self.normalized[r]), r))
+        return [
+            {"type": kind, "id": id, "name": name, "region_id": region_id, "region": region, "match": "prefix" if r in exact else "phonetic"}
+            for r in ranked[:limit]
+            for kind, id, name, region_id, region in [self.entries[r]]
+        ]
+
+def load_tree(session: Session) -> List[Region]:
+    # Two queries: regions, then all of their cities
+    return session.exec(select(Region).options(selectinload(Region.cities)).order_by(Region.id)).all()
+
+class CoverageIndexStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built: Optional[Tuple[tuple, CoverageIndex]] = None
+
+    def get(self, session: Session) -> CoverageIndex:
+        stamp = tuple(versions.get(n)[0] for n in COVERAGE_COLLECTIONS)
+        built = self._built
+        if built is not None and built[0] == stamp:
+            return built[1]
+        with self._lock:
+            built = self._built
+            if built is not None and built[0] == stamp:
+                return built[1]
+            index = CoverageIndex(load_tree(session))
+            self._built = (stamp, index)
+            return index
+
+store = CoverageIndexStore()
@@ -0,0 +1,56 @@
+import os
+import json
+from typing import Iterable, List, Optional, Sequence
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlmodel import Session, select
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Opt-in fast path for large read-only lists (FAST_JSON_ENABLED=1). Handlers
+# select plain columns instead of building ORM instances and return
+# FastJSONResponse, which skips FastAPI's response_model validation and encodes
+# with orjson when it is installed. The output is the same JSON the standard
+# path produces; with the flag off the handlers return model rows as before.
+
+FAST_JSON_ENABLED = os.getenv("FAST_JSON_ENABLED", "0") == "1"
+
+def _default(value):
+    # Models, datetimes (for json), Decimals: only values the encoder can't handle natively
+    return jsonable_encoder(value)
+
+def dumps(value) -> bytes:
+    if orjson is not None and FAST_JSON_ENABLED:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def field_names(model) -> List[str]:
+    return list(model.__table__.columns.keys())
+
+def as_dicts(rows: Iterable[Sequence], names: Sequence[str]) -> List[dict]:
+    return [dict(zip(names, row)) for row in rows]
+
+def list_rows(session: Session, model, *order_by, names: Optional[Sequence[str]] = None) -> List[dict]:
+    """All rows of a table as plain dicts, without constructing model instances."""
+    names = list(names or field_names(model))
+    query = select(*[getattr(model, n) for n in names])
+    if order_by:
+        query = query.order_by(*order_by)
+    return as_dicts(session.exec(query).all(), names)
+
+def list_response(session: Session, model, *order_by, headers=None):
+    """A read-only list endpoint's result: plain rows in FastJSONResponse when
+    FAST_JSON_ENABLED, otherwise model instances for the standard response_model path."""
+    if FAST_JSON_ENABLED:
+        return FastJSONResponse(list_rows(session, model, *order_by), headers=headers)
+    query = select(model)
+    if order_by:
+        query = query.order_by(*order_by)
+    return session.exec(query).all()
@@ -0,0 +1,88 @@
+import os
+import threading
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+from models import SiteContent, Banner, Category, Product, Region
+from http_cache import versions
+from read_cache import render
+
+# Everything the homepage renders, built in a fixed number of queries and kept
+# as serialized JSON. It is rebuilt only when one of the collections it reads
+# has a new version stamp.
+
+HOME_COLLECTIONS = ("content", "banners", "categories", "products", "regions", "cities")
+HOME_FEATURED_PRODUCTS = int(os.getenv("HOME_FEATURED_PRODUCTS", "8"))
+HOME_CATEGORY_PRODUCTS = int(os.getenv("HOME_CATEGORY_PRODUCTS", "4"))
+
+PRODUCT_CARD = ("id", "name", "slug", "description", "image_url", "category_id", "stock_status")
+
+def _card(p: Product) -> dict:
+    return {f: getattr(p, f) for f in PRODUCT_CARD}
+
+def _category_cards(session: Session) -> dict:
+    """category_id -> the first HOME_CATEGORY_PRODUCTS active product cards, in one query."""
+    rank = func.row_number().over(partition_by=Product.category_id, order_by=Product.id).label("rank")
+    ranked = (
+        select(*[getattr(Product, f) for f in PRODUCT_CARD], rank)
+        .where(Product.is_active == True, Product.category_id != None)
+        .subquery()
+    )
+    rows = session.exec(
+        select(*[ranked.c[f] for f in PRODUCT_CARD]).where(ranked.c.rank <= HOME_CATEGORY_PRODUCTS).order_by(ranked.c.id)
+    ).all()
+    cards = {}
+    for row in rows:
+        card = dict(zip(PRODUCT_CARD, row))
+        cards.setdefault(card["category_id"], []).append(card)
+    return cards
+
+def build(session: Session) -> dict:
+    # 8 queries; product rows read are bounded by the card limits, not the catalog
+    content = {c.key: c.value for c in session.exec(select(SiteContent)).all()}
+    banners = session.exec(
+        select(Banner).where(Banner.is_active == True).order_by(Banner.position, Banner.display_order, Banner.id)
+    ).all()
+    categories = session.exec(select(Category).order_by(Category.display_order, Category.id)).all()
+    counts = dict(session.exec(
+        select(Product.category_id, func.count(Product.id)).where(Product.is_active == True).group_by(Product.category_id)
+    ).all())
+    cards = _category_cards(session)
+    featured = session.exec(
+        select(Product).where(Product.is_active == True).order_by(Product.id).limit(HOME_FEATURED_PRODUCTS)
+    ).all()
+    regions = session.exec(select(Region).options(selectinload(Region.cities)).order_by(Region.id)).all()
+    return {
+        "content": content,
+        "banners": [b.dict() for b in banners],
+        "categories": [
+            {**c.dict(), "product_count": counts.get(c.id, 0), "products": cards.get(c.id, [])}
+            for c in categories
+        ],
+        "products": [_card(p) for p in featured],
+        "regions": [{**r.dict(), "cities": [c.dict() for c in sorted(r.cities, key=lambda c: c.id)]} for r in regions],
+        "generated_at": datetime.utcnow(),
+    }
+
+class HomeSnapshot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built: Optional[Tuple[tuple, bytes]] = None
+
+    def get(self, session: Session) -> bytes:
+        stamp = tuple(versions.get(n)[0] for n in HOME_COLLECTIONS)
+        built = self._built
+        if built is not None and built[0] == stamp:
+            return built[1]
+        with self._lock:
+            # Another request may have rebuilt it while we waited
+            built = self._built
+            if built is not None and built[0] == stamp:
+                return built[1]
+            body = render(build(session))
+            self._built = (stamp, body)
+            return body
+
+snapshot = HomeSnapshot()
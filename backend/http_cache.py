@@ -0,0 +1,147 @@
+import os
+import time
+import hashlib
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from fastapi import Depends, HTTPException, Request, Response
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Per-collection version stamps for conditional GETs. Admin writes bump the
+# stamp of each collection they change. Stamps live in small files under
+# VERSION_DIR so every worker on the host sees a bump; a request only costs a
+# stat() per collection, and a matching If-None-Match is answered with 304
+# before the handler runs any query.
+
+VERSION_DIR = os.getenv("VERSION_DIR", "data/versions")
+# Browsers always revalidate (cheap with ETags); shared caches may keep a copy
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "0"))
+HTTP_CACHE_S_MAXAGE = int(os.getenv("HTTP_CACHE_S_MAXAGE", "60"))
+HTTP_CACHE_STALE_WHILE_REVALIDATE = int(os.getenv("HTTP_CACHE_STALE_WHILE_REVALIDATE", "300"))
+
+COLLECTIONS = ("products", "categories", "content", "pages", "regions", "cities", "media", "banners", "knowledge")
+
+class VersionStore:
+    def __init__(self, base_dir: str = VERSION_DIR):
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        # name -> ((inode, mtime_ns), version, modified_at)
+        self._seen: Dict[str, Tuple[tuple, str, float]] = {}
+        # Called with the bumped names and ids=, e.g. to drop cached reads in this worker
+        self.listeners: List[Callable] = []
+        self._boot = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.base_dir, name)
+
+    def bump(self, *names: str, ids: Optional[Iterable] = None) -> None:
+        """New stamps for these collections; ids optionally names the rows that
+        changed so listeners can limit their work to them."""
+        self._write(*names)
+        ids = None if ids is None else list(ids)
+        for listener in self.listeners:
+            listener(*names, ids=ids)
+
+    def _write(self, *names: str) -> None:
+        os.makedirs(self.base_dir, exist_ok=True)
+        for name in names:
+            now = time.time()
+            # A fresh token rather than a counter, so concurrent bumps need no read-modify-write
+            token = f"{time.time_ns():x}{os.getpid():x}"
+            tmp = f"{self._path(name)}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(f"{token} {now}")
+            os.replace(tmp, self._path(name))
+
+    def claim_startup(self) -> bool:
+        """True in the first worker of a boot: no other live process holds the
+        boot lock. Every worker then keeps a shared lock until it exits, so
+        workers started or restarted alongside it get False."""
+        if fcntl is None:
+            return True
+        os.makedirs(self.base_dir, exist_ok=True)
+        self._boot = open(os.path.join(self.base_dir, ".boot.lock"), "w")
+        try:
+            fcntl.flock(self._boot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fcntl.flock(self._boot, fcntl.LOCK_SH)
+            return False
+        fcntl.flock(self._boot, fcntl.LOCK_SH)
+        return True
+
+    def get(self, name: str) -> Tuple[str, float]:
+        """(version, modified_at as a unix time) for a collection."""
+        try:
+            st = os.stat(self._path(name))
+        except FileNotFoundError:
+            # Only a starting point for ETags; nothing changed, so listeners aren't told
+            self._write(name)
+            st = os.stat(self._path(name))
+        # os.replace gives every bump a new inode, so this holds even on coarse mtimes
+        ident = (st.st_ino, st.st_mtime_ns)
+        seen = self._seen.get(name)
+        if seen is not None and seen[0] == ident:
+            return seen[1], seen[2]
+        with open(self._path(name)) as f:
+            token, modified = f.read().split()
+        with self._lock:
+            self._seen[name] = (ident, token, float(modified))
+        return token, float(modified)
+
+versions = VersionStore()
+
+def bump(*names: str, ids: Optional[Iterable] = None) -> None:
+    versions.bump(*names, ids=ids)
+
+def stamps(*names: str) -> tuple:
+    """Current versions of these collections, for in-process caches that must
+    notice writes handled by any worker."""
+    return tuple(versions.get(n)[0] for n in names)
+
+def validators(request: Request, names: Tuple[str, ...]) -> Tuple[str, float]:
+    """Strong ETag for this URL at the current versions, and the latest modification time."""
+    stamps = [versions.get(n) for n in names]
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    key = f"{request.url.path}?{query}|" + "|".join(v for v, _ in stamps)
+    return '"' + hashlib.sha1(key.encode("utf-8")).hexdigest()[:24] + '"', max(m for _, m in stamps)
+
+def _not_modified(request: Request, etag: str, modified_at: float) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = [t.strip() for t in inm.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(modified_at) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def cacheable(*names: str):
+    """Route dependency: ETag, Last-Modified and Cache-Control for a public GET
+    built from the given collections, and a 304 when the client is current."""
+    def dependency(request: Request, response: Response):
+        etag, modified_at = validators(request, names)
+        if "authorization" in request.headers:
+            # Admin reads must never be served from a shared cache
+            cache_control = "private, no-cache"
+        else:
+            cache_control = (
+                f"public, max-age={HTTP_CACHE_MAX_AGE}, s-maxage={HTTP_CACHE_S_MAXAGE}, "
+                f"stale-while-revalidate={HTTP_CACHE_STALE_WHILE_REVALIDATE}"
+            )
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(modified_at, usegmt=True),
+            "Cache-Control": cache_control,
+            "Vary": "Authorization",
+        }
+        if _not_modified(request, etag, modified_at):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return Depends(dependency)
@@ -0,0 +1,436 @@
+import os
+import time
+import uuid
+import random
+import re
+import hashlib
+import unicodedata
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+import llm
+from database import engine
+from models import ChatbotKnowledge, SiteContent, Product, EmbeddingDocument, ChunkEmbedding, ReindexJobRecord
+from vector_index import index as vector_index, encode_vector
+from answer_cache import cache as answer_cache
+
+# Chunks per embed_content call and number of calls in flight
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "3"))
+EMBED_RETRY_BASE_SECONDS = float(os.getenv("EMBED_RETRY_BASE_SECONDS", "1.0"))
+MAX_JOBS_KEPT = 20
+# Job progress is written to reindex_jobs at most this often; a running job
+# silent for REINDEX_JOB_STALE_SECONDS is taken to have died with its worker
+REINDEX_JOB_SAVE_SECONDS = float(os.getenv("REINDEX_JOB_SAVE_SECONDS", "2"))
+REINDEX_JOB_STALE_SECONDS = float(os.getenv("REINDEX_JOB_STALE_SECONDS", "600"))
+ACTIVE_STATUSES = ("queued", "running")
+
+# --- Corpus ---
+
+# Chunk size and overlap in approximate tokens (words and punctuation marks)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?\u061f])\s+")
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(f"{llm.EMBED_MODEL}\n{text}".encode("utf-8")).hexdigest()
+
+def normalize_text(text: str) -> str:
+    # Same chunk text, same hash: unicode forms, runs of spaces and blank lines don't count
+    lines = (" ".join(line.split()) for line in unicodedata.normalize("NFKC", text).splitlines())
+    return "\n".join(line for line in lines if line)
+
+def count_tokens(text: str) -> int:
+    return len(TOKEN_RE.findall(text))
+
+def _sentences(text: str, max_tokens: int) -> List[tuple]:
+    """(sentence, separator before it, tokens); sentences over max_tokens are cut between words."""
+    units = []
+    for line in text.split("\n"):
+        sep = "\n"
+        for sentence in SENTENCE_END_RE.split(line):
+            n = count_tokens(sentence)
+            if n <= max_tokens:
+                units.append((sentence, sep, n))
+                sep = " "
+                continue
+            piece, piece_tokens = [], 0
+            for word in sentence.split(" "):
+                w = count_tokens(word)
+                if piece and piece_tokens + w > max_tokens:
+                    units.append((" ".join(piece), sep, piece_tokens))
+                    sep = " "
+                    piece, piece_tokens = [], 0
+                piece.append(word)
+                piece_tokens += w
+            if piece:
+                units.append((" ".join(piece), sep, piece_tokens))
+                sep = " "
+    return units
+
+def _join(units: List[tuple]) -> str:
+    return "".join((sep if i else "") + s for i, (s, sep, _) in enumerate(units))
+
+def chunk(text: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """Pack whole sentences into chunks of up to max_tokens. Consecutive chunks
+    share trailing sentences worth up to overlap_tokens."""
+    text = normalize_text(text)
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    chunks = []
+    current, tokens = [], 0
+    for unit in _sentences(text, max_tokens):
+        n = unit[2]
+        if current and tokens + n > max_tokens:
+            chunks.append(_join(current))
+            carry, carry_tokens = [], 0
+            for u in reversed(current):
+                if carry_tokens + u[2] > overlap_tokens:
+                    break
+                carry.insert(0, u)
+                carry_tokens += u[2]
+            current, tokens = (carry, carry_tokens) if carry_tokens + n <= max_tokens else ([], 0)
+        current.append(unit)
+        tokens += n
+    if current:
+        chunks.append(_join(current))
+    return chunks
+
+def knowledge_text(item: ChatbotKnowledge) -> str:
+    return f"{item.question}\n{item.answer}"
+
+def knowledge_items(item: ChatbotKnowledge) -> List[tuple]:
+    return [("knowledge", str(item.id), i, c) for i, c in enumerate(chunk(knowledge_text(item)))]
+
+def corpus_items(session: Session) -> List[tuple]:
+    items: List[tuple] = []
+    # Knowledge vectors are always indexed; RAG_INCLUDE_KB only decides how /ask ranks them
+    kb = session.exec(select(ChatbotKnowledge).where(ChatbotKnowledge.is_active == True)).all()
+    for k in kb:
+        items.extend(knowledge_items(k))
+    content = session.exec(select(SiteContent)).all()
+    for s in content:
+        for i, c in enumerate(chunk(f"{s.key}: {s.value}")):
+            items.append(("content", s.key, i, c))
+    products = session.exec(select(Product).where(Product.is_active == True)).all()
+    for p in products:
+        base = f"Product: {p.name}\nDescription: {p.description or ''}"
+        for i, c in enumerate(chunk(base)):
+            items.append(("product", str(p.id), i, c))
+    return items
+
+def stored_docs(session: Session, source_type: Optional[str] = None, source_id: Optional[str] = None) -> List[tuple]:
+    # Only the columns needed for diffing, vectors stay in the database
+    query = select(
+        EmbeddingDocument.id, EmbeddingDocument.source_type, EmbeddingDocument.source_id,
+        EmbeddingDocument.chunk_index, EmbeddingDocument.content_hash,
+        (ChunkEmbedding.content_hash != None) | (EmbeddingDocument.embedding != None),
+    ).outerjoin(ChunkEmbedding, ChunkEmbedding.content_hash == EmbeddingDocument.content_hash)
+    if source_type is not None:
+        query = query.where(EmbeddingDocument.source_type == source_type)
+    if source_id is not None:
+        query = query.where(EmbeddingDocument.source_id == source_id)
+    return session.exec(query).all()
+
+def stored_hashes(session: Session, hashes: List[str]) -> set:
+    found = set()
+    for i in range(0, len(hashes), 500):
+        found.update(session.exec(select(ChunkEmbedding.content_hash).where(ChunkEmbedding.content_hash.in_(hashes[i:i + 500]))).all())
+    return found
+
+def drop_unreferenced(session: Session, hashes: List[str]) -> int:
+    """Delete shared vectors that no document row points to any more."""
+    dropped = 0
+    for i in range(0, len(hashes), 500):
+        batch = hashes[i:i + 500]
+        used = set(session.exec(select(EmbeddingDocument.content_hash).where(EmbeddingDocument.content_hash.in_(batch))).all())
+        orphans = [h for h in batch if h not in used]
+        if orphans:
+            session.execute(delete(ChunkEmbedding).where(ChunkEmbedding.content_hash.in_(orphans)))
+            dropped += len(orphans)
+    return dropped
+
+# --- Jobs ---
+
+class ReindexJob:
+    def __init__(self, full: bool = False, persist: bool = False):
+        self.id = uuid.uuid4().hex
+        # Only jobs started through start_job are shared; single-item syncs aren't
+        self.persist = persist
+        self.full = full
+        self.status = "queued"
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.total = 0
+        self.unchanged = 0
+        self.to_embed = 0
+        self.embedded = 0
+        self.failed = 0
+        self.written = 0
+        self.deleted = 0
+        self.errors: List[str] = []
+        self._saved_at = 0.0
+
+    COUNTERS = ("total", "unchanged", "to_embed", "embedded", "failed", "written", "deleted")
+
+    @classmethod
+    def from_record(cls, record: ReindexJobRecord) -> "ReindexJob":
+        job = cls(record.full, persist=True)
+        job.id = record.id
+        job.status = record.status
+        job.created_at, job.started_at, job.finished_at = record.created_at, record.started_at, record.finished_at
+        state = json.loads(record.state or "{}")
+        for name in cls.COUNTERS:
+            setattr(job, name, state.get(name, 0))
+        job.errors = state.get("errors", [])
+        return job
+
+    def save(self, force: bool = True) -> None:
+        """Write progress to reindex_jobs; with force=False, only if the last
+        write is older than REINDEX_JOB_SAVE_SECONDS."""
+        if not self.persist or (not force and time.monotonic() - self._saved_at < REINDEX_JOB_SAVE_SECONDS):
+            return
+        self._saved_at = time.monotonic()
+        state = {name: getattr(self, name) for name in self.COUNTERS}
+        state["errors"] = self.errors[-20:]
+        with Session(engine) as session:
+            record = session.get(ReindexJobRecord, self.id) or ReindexJobRecord(id=self.id, full=self.full, created_at=self.created_at, status=self.status)
+            record.status = self.status
+            record.active = "reindex" if self.status in ACTIVE_STATUSES else None
+            record.started_at, record.finished_at = self.started_at, self.finished_at
+            record.updated_at = datetime.utcnow()
+            record.state = json.dumps(state)
+            session.add(record)
+            try:
+                session.commit()
+            except IntegrityError:
+                # Taken over as abandoned while we were silent; keep reporting without the claim
+                session.rollback()
+                record = session.get(ReindexJobRecord, self.id)
+                if record is None:
+                    raise
+                record.status, record.active = self.status, None
+                record.finished_at, record.updated_at, record.state = self.finished_at, datetime.utcnow(), json.dumps(state)
+                session.add(record)
+                session.commit()
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or datetime.utcnow()
+        elapsed = (end - self.started_at).total_seconds() if self.started_at else 0.0
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "full": self.full,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(elapsed, 3),
+            "indexed": self.total,
+            "unchanged": self.unchanged,
+            "to_embed": self.to_embed,
+            "embedded": self.embedded,
+            "failed": self.failed,
+            "written": self.written,
+            "deleted": self.deleted,
+            "chunks_per_second": round(self.embedded / elapsed, 2) if elapsed > 0 else 0.0,
+            "errors": self.errors[-20:],
+        }
+
+# Jobs run by this worker, with live counters; reindex_jobs has everyone's
+_jobs: "OrderedDict[str, ReindexJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+
+def _release_stale(session: Session, record: ReindexJobRecord) -> None:
+    # Conditional, so of several workers finding the same dead job only one fails it
+    state = json.loads(record.state or "{}")
+    state["errors"] = (state.get("errors", []) + ["Abandoned: no progress reported"])[-20:]
+    now = datetime.utcnow()
+    session.execute(
+        update(ReindexJobRecord)
+        .where(ReindexJobRecord.id == record.id, ReindexJobRecord.updated_at == record.updated_at)
+        .values(status="failed", active=None, finished_at=now, updated_at=now, state=json.dumps(state))
+    )
+    session.commit()
+
+def start_job(full: bool = False) -> tuple:
+    """Return (job, created). A job already queued or running on any worker is
+    reused: the claim is the insert itself, which the unique index on
+    reindex_jobs.active lets only one worker win."""
+    with _jobs_lock, Session(engine) as session:
+        while True:
+            job = ReindexJob(full, persist=True)
+            session.add(ReindexJobRecord(id=job.id, full=full, created_at=job.created_at, status=job.status, active="reindex"))
+            try:
+                session.commit()
+                break
+            except IntegrityError:
+                session.rollback()
+            record = session.exec(select(ReindexJobRecord).where(ReindexJobRecord.active == "reindex")).first()
+            if record is None:
+                # Finished between our insert and this read
+                continue
+            if record.updated_at >= datetime.utcnow() - timedelta(seconds=REINDEX_JOB_STALE_SECONDS):
+                return _jobs.get(record.id) or ReindexJob.from_record(record), False
+            _release_stale(session, record)
+        job.save()
+        _jobs[job.id] = job
+        while len(_jobs) > MAX_JOBS_KEPT:
+            _jobs.popitem(last=False)
+        old = session.exec(
+            select(ReindexJobRecord.id).order_by(ReindexJobRecord.created_at.desc()).offset(MAX_JOBS_KEPT)
+        ).all()
+        if old:
+            session.execute(delete(ReindexJobRecord).where(ReindexJobRecord.id.in_(old)))
+            session.commit()
+        return job, True
+
+def get_job(job_id: str) -> Optional[ReindexJob]:
+    job = _jobs.get(job_id)
+    if job is not None:
+        return job
+    with Session(engine) as session:
+        record = session.get(ReindexJobRecord, job_id)
+        return ReindexJob.from_record(record) if record else None
+
+def run_reindex(job: ReindexJob):
+    job.status = "running"
+    job.started_at = datetime.utcnow()
+    job.save()
+    try:
+        with Session(engine) as session:
+            items = corpus_items(session)
+            sync_embeddings(session, items, stored_docs(session), full=job.full, job=job, publish=True)
+        job.status = "completed" if not job.failed else "completed_with_errors"
+    except Exception as e:
+        job.errors.append(str(e))
+        job.status = "failed"
+    finally:
+        job.finished_at = datetime.utcnow()
+        job.save()
+
+# --- Embedding ---
+
+def embed_batch(texts: List[str]) -> List[List[float]]:
+    delay = EMBED_RETRY_BASE_SECONDS
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            return llm.embed_texts(texts)
+        except Exception:
+            if attempt == EMBED_MAX_RETRIES:
+                raise
+            time.sleep(delay * (1 + random.random()))
+            delay *= 2
+
+def _write(session: Session, job: ReindexJob, pending: dict, hashes: List[str], vectors: Optional[List[tuple]] = None):
+    """Point the pending rows for these hashes at their shared vectors, storing
+    new (blob, dim, norm) vectors first when given."""
+    if vectors:
+        stored = {c.content_hash: c for c in session.exec(select(ChunkEmbedding).where(ChunkEmbedding.content_hash.in_(hashes))).all()}
+        for h, (blob, dim, norm) in zip(hashes, vectors):
+            vec = stored.get(h) or ChunkEmbedding(content_hash=h, embedding=blob, dim=dim, norm=norm)
+            vec.embedding, vec.dim, vec.norm = blob, dim, norm
+            session.add(vec)
+    ids = [t[0] for h in hashes for t in pending[h] if t[0] is not None]
+    docs = {}
+    if ids:
+        docs = {d.id: d for d in session.exec(select(EmbeddingDocument).where(EmbeddingDocument.id.in_(ids))).all()}
+    now = datetime.utcnow()
+    for h in hashes:
+        for doc_id, source_type, source_id, chunk_index, text in pending[h]:
+            doc = docs.get(doc_id)
+            if doc is None:
+                doc = EmbeddingDocument(source_type=source_type, source_id=source_id, chunk_index=chunk_index, text=text)
+            doc.text = text
+            doc.embedding, doc.dim, doc.norm = None, None, None
+            doc.embedding_json = None
+            doc.content_hash = h
+            doc.updated_at = now
+            session.add(doc)
+            job.written += 1
+    session.commit()
+    job.save(force=False)
+
+def sync_embeddings(session: Session, items: List[tuple], docs: List[tuple], full: bool = False, job: Optional[ReindexJob] = None, publish: bool = False) -> ReindexJob:
+    """Diff (source_type, source_id, chunk_index, text) items against the stored_docs
+    rows in scope. Only new or changed chunks are embedded, once per unique chunk
+    and in concurrent batches, and each batch is committed as it lands. Existing
+    rows are updated in place and stale rows (then vectors nothing points to) are
+    removed last, so /ask never sees an empty index. With publish, the index is
+    rebuilt and retrained from every row; otherwise the published version is
+    patched with the rows written here. Either way other workers map the result."""
+    job = job or ReindexJob(full)
+    job.total = len(items)
+    existing = {}
+    stale_ids = []
+    # Shared vectors that may lose their last reference
+    old_hashes = {d[4] for d in docs if d[4]}
+    for doc_id, source_type, source_id, chunk_index, h, has_vector in docs:
+        key = (source_type, source_id, chunk_index)
+        if key in existing:
+            stale_ids.append(existing[key][0])
+        existing[key] = (doc_id, h if has_vector else None)
+    # content hash -> rows that need that vector
+    pending = {}
+    for source_type, source_id, chunk_index, text in items:
+        h = content_hash(text)
+        old_hashes.discard(h)
+        row = existing.pop((source_type, source_id, chunk_index), None)
+        if not full and row is not None and row[1] == h:
+            job.unchanged += 1
+            continue
+        pending.setdefault(h, []).append((row[0] if row else None, source_type, source_id, chunk_index, text))
+    stale_ids.extend(r[0] for r in existing.values())
+
+    # Each unique chunk is embedded once, however many rows share it
+    known = set() if full else stored_hashes(session, list(pending))
+    ready = [h for h in pending if h in known]
+    to_embed = [(h, targets[0][4]) for h, targets in pending.items() if h not in known]
+    job.to_embed = len(to_embed)
+    for i in range(0, len(ready), EMBED_BATCH_SIZE):
+        _write(session, job, pending, ready[i:i + EMBED_BATCH_SIZE])
+
+    batches = [to_embed[i:i + EMBED_BATCH_SIZE] for i in range(0, len(to_embed), EMBED_BATCH_SIZE)]
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(1, EMBED_CONCURRENCY)) as pool:
+            futures = {pool.submit(embed_batch, [text for _, text in b]): b for b in batches}
+            for fut in as_completed(futures):
+                batch = futures[fut]
+                try:
+                    vectors = fut.result()
+                except Exception as e:
+                    # Rows in a failed batch keep their previous vectors
+                    job.failed += len(batch)
+                    job.errors.append(str(e))
+                    continue
+                job.embedded += len(batch)
+                _write(session, job, pending, [h for h, _ in batch], [encode_vector(v) for v in vectors])
+
+    for i in range(0, len(stale_ids), 500):
+        session.execute(delete(EmbeddingDocument).where(EmbeddingDocument.id.in_(stale_ids[i:i + 500])))
+    if full:
+        old_hashes = set(session.exec(select(ChunkEmbedding.content_hash)).all())
+    drop_unreferenced(session, sorted(old_hashes))
+    session.commit()
+    job.deleted = len(stale_ids)
+    if publish:
+        vector_index.load(session)
+        vector_index.publish()
+    else:
+        vector_index.refresh(session)
+    answer_cache.invalidate()
+    return job
+
+def index_knowledge(session: Session, item_id: int, item: Optional[ChatbotKnowledge] = None) -> ReindexJob:
+    docs = stored_docs(session, "knowledge", str(item_id))
+    items = knowledge_items(item) if item is not None and item.is_active else []
+    return sync_embeddings(session, items, docs)
@@ -0,0 +1,103 @@
+import os
+import re
+import math
+import time
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+from sqlmodel import Session, select
+from models import ChatbotKnowledge
+from bm25_index import tokenize as keywords
+from http_cache import stamps
+
+# Word-level trie over the fallback phrases and knowledge question keywords.
+# One pass over the message finds every rule phrase and KB keyword on word
+# boundaries; it is rebuilt when the knowledge version stamp moves (a write on
+# any worker) or when the TTL lapses.
+
+INTENT_MATCHER_TTL_SECONDS = float(os.getenv("INTENT_MATCHER_TTL_SECONDS", "300"))
+
+# Checked in this order by the fallback
+RULES = {
+    "greeting": ["hi", "hello", "hey", "salam", "assalam", "assalamu", "assalam o alaikum", "asalam"],
+    "clarification": ["price", "cost", "service", "services", "product", "products", "range"],
+    "about": ["what is te", "trans emirates", "about"],
+    "contact": ["phone", "email", "address", "contact"],
+}
+
+def words(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+class IntentMatcher:
+    def __init__(self, kb: List[Tuple[int, str, str]], version: tuple = ()):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.root: dict = {}
+        for intent, phrases in RULES.items():
+            for phrase in phrases:
+                self._add(words(phrase), intent)
+        self.answers = {kb_id: answer for kb_id, _, answer in kb}
+        self.postings: Dict[str, List[int]] = {}
+        for kb_id, question, _ in kb:
+            for word in dict.fromkeys(keywords(question)):
+                self.postings.setdefault(word, []).append(kb_id)
+                self._add([word], None)
+        # Rarer keywords say more about which item was meant
+        self.weights = {w: math.log(1 + len(kb) / len(ids)) for w, ids in self.postings.items()}
+
+    def _add(self, tokens: List[str], intent: Optional[str]):
+        node = self.root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        # None cannot collide with a token; it holds what ends at this node
+        out = node.setdefault(None, set())
+        out.add(intent if intent is not None else "")
+
+    def match(self, text: str) -> Tuple[Set[str], Optional[int]]:
+        """Return the rule intents found in text and the best matching KB item id."""
+        tokens = words(text)
+        intents: Set[str] = set()
+        kb_words: Set[str] = set()
+        for i in range(len(tokens)):
+            node = self.root
+            for token in tokens[i:]:
+                node = node.get(token)
+                if node is None:
+                    break
+                for intent in node.get(None, ()):
+                    if intent:
+                        intents.add(intent)
+                    elif token in self.postings:
+                        kb_words.add(token)
+        scores: Counter = Counter()
+        for word in kb_words:
+            for kb_id in self.postings[word]:
+                scores[kb_id] += self.weights[word]
+        best = max(scores.items(), key=lambda x: (x[1], -x[0]))[0] if scores else None
+        return intents, best
+
+class IntentMatcherStore:
+    def __init__(self, ttl: float = INTENT_MATCHER_TTL_SECONDS):
+        self.ttl = ttl
+        self._matcher: Optional[IntentMatcher] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._matcher = None
+
+    def get(self, session: Session) -> IntentMatcher:
+        version = stamps("knowledge")
+        m = self._matcher
+        if m is not None and m.version == version and time.monotonic() - m.built_at < self.ttl:
+            return m
+        kb = session.exec(
+            select(ChatbotKnowledge.id, ChatbotKnowledge.question, ChatbotKnowledge.answer)
+            .where(ChatbotKnowledge.is_active == True).order_by(ChatbotKnowledge.id)
+        ).all()
+        m = IntentMatcher(list(kb), version)
+        with self._lock:
+            self._matcher = m
+        return m
+
+store = IntentMatcherStore()
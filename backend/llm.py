@@ -0,0 +1,106 @@
+import os
+import re
+import time
+import hashlib
+from typing import Iterator, List, Optional
+import numpy as np
+
+# Embedding and generation providers. LLM_PROVIDER=gemini (default) calls the
+# Gemini API; LLM_PROVIDER=fake is a deterministic local stand-in for
+# benchmarks and offline development.
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
+
+class GeminiProvider:
+    embed_model = 'models/text-embedding-004'
+
+    def __init__(self):
+        import google.generativeai as genai
+        self.genai = genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self.model = genai.GenerativeModel('gemini-pro')
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        # One request for the whole batch; the API returns one vector per input
+        r = self.genai.embed_content(model=self.embed_model, content=texts)
+        return r['embedding']
+
+    def generate(self, prompt: str) -> str:
+        return self.model.generate_content(prompt).text
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        for part in self.model.generate_content(prompt, stream=True):
+            yield part.text
+
+class FakeProvider:
+    """Hashed bag-of-words embeddings and a canned answer built from the first
+    context line, with optional per-call latency to stand in for the network."""
+
+    def __init__(self, dim: int = 256, embed_latency_ms: float = 0.0, generate_latency_ms: float = 0.0, token_latency_ms: float = 0.0):
+        self.dim = dim
+        self.embed_model = f"fake-bow-{dim}"
+        self.embed_latency = embed_latency_ms / 1000
+        self.generate_latency = generate_latency_ms / 1000
+        self.token_latency = token_latency_ms / 1000
+
+    def _embed(self, text: str) -> List[float]:
+        v = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            v[int.from_bytes(hashlib.md5(word.encode("utf-8")).digest()[:4], "little") % self.dim] += 1.0
+        return v.tolist()
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        if self.embed_latency:
+            time.sleep(self.embed_latency)
+        return [self._embed(t) for t in texts]
+
+    def _answer(self, prompt: str) -> str:
+        context = prompt.split("Context:\n", 1)[-1].split("\n\nUser:\n", 1)[0]
+        line = next((l for l in context.splitlines() if l.strip() and not l.endswith(":")), "")
+        return f"Based on our records: {line[:200]}" if line else "I don't have that information."
+
+    def generate(self, prompt: str) -> str:
+        if self.generate_latency:
+            time.sleep(self.generate_latency)
+        return self._answer(prompt)
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        if self.generate_latency:
+            time.sleep(self.generate_latency)
+        for word in self._answer(prompt).split(" "):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield word + " "
+
+def make_provider(name: str = LLM_PROVIDER):
+    if name == "fake":
+        return FakeProvider(
+            dim=int(os.getenv("FAKE_EMBED_DIM", "256")),
+            embed_latency_ms=float(os.getenv("FAKE_EMBED_LATENCY_MS", "0")),
+            generate_latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "0")),
+            token_latency_ms=float(os.getenv("FAKE_LLM_TOKEN_LATENCY_MS", "0")),
+        )
+    if name == "gemini":
+        return GeminiProvider()
+    raise ValueError(f"Unknown LLM_PROVIDER: {name}")
+
+provider = make_provider()
+# Part of every content hash, so vectors from another provider are never reused
+EMBED_MODEL = provider.embed_model
+
+def set_provider(p) -> None:
+    global provider, EMBED_MODEL
+    provider = p
+    EMBED_MODEL = p.embed_model
+
+def embed_text(text: str) -> List[float]:
+    return provider.embed_texts([text])[0]
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    return provider.embed_texts(texts)
+
+def generate(prompt: str) -> Optional[str]:
+    return provider.generate(prompt)
+
+def generate_stream(prompt: str) -> Iterator[str]:
+    return provider.generate_stream(prompt)
@@ -1,10 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from database import create_db_and_tables, engine
+from migrate_embeddings import relax_json_column
+from chat_retention import start_scheduler
+from product_search import ensure_search_index
+from http_cache import bump, versions, COLLECTIONS
+from home_snapshot import snapshot as home_snapshot
+from static_catalog import PrecompressedStaticFiles
+from media_store import UploadSizeLimit, backfill_hashes
 from sqlmodel import Session, select
 from models import SiteContent, Product
-from routers import auth, products, inquiries, content, coverage, chatbot, media
+from routers import auth, products, inquiries, content, coverage, chatbot, media, cache, banners, snapshot
 from dotenv import load_dotenv
 import os
 
@@ -16,7 +22,7 @@ app = FastAPI(
     version="1.0.0"
 )
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 
 # CORS Configuration
 origins = [
@@ -26,12 +32,16 @@ origins = [
     "*" # Allow all for development if needed, but restrict in prod
 ]
 
+# Added before CORS so CORS also wraps its 413 responses
+app.add_middleware(UploadSizeLimit, path="/media/upload")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag", "Last-Modified", "X-Media-Deduplicated"],
 )
 
 # Include Routers
@@ -42,10 +52,15 @@ app.include_router(content.router)
 app.include_router(coverage.router)
 app.include_router(chatbot.router)
 app.include_router(media.router)
+app.include_router(cache.router)
+app.include_router(banners.router)
+app.include_router(snapshot.router)
 
 @app.on_event("startup")
 def on_startup():
     create_db_and_tables()
+    relax_json_column()
+    ensure_search_index()
     with Session(engine) as session:
         about = session.get(SiteContent, "about")
         if not about:
@@ -60,6 +75,15 @@ def on_startup():
                 value="Trusted Trading and Consulting Partner in Saudi Arabia"
             ))
         session.commit()
+        backfill_hashes(session)
+    # Data may have changed while we were down (seeds, scripts, migrations).
+    # The first worker of a boot bumps everything, which also queues a full
+    # static catalog publish; workers starting next to it have nothing to redo
+    if versions.claim_startup():
+        bump(*COLLECTIONS)
+    with Session(engine) as session:
+        home_snapshot.get(session)
+    start_scheduler()
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,252 @@
+import os
+import hashlib
+import tempfile
+import threading
+from typing import BinaryIO, Dict, Optional, Tuple
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+from sqlmodel import Session, select
+from models import MediaAsset
+
+# Media files are stored under a name derived from their SHA-256. The upload
+# route parses the multipart body as it arrives and writes the file part
+# straight to a temp file in UPLOAD_DIR, hashing on the way, so the bytes hit
+# the disk once. An upload whose hash matches an existing asset reuses that
+# asset's file and row instead of adding a copy.
+
+UPLOAD_DIR = "static/uploads"
+UPLOAD_URL = "http://localhost:8000/static/uploads"
+MEDIA_MAX_UPLOAD_BYTES = int(os.getenv("MEDIA_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+MEDIA_CHUNK_BYTES = 1024 * 1024
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+_lock = threading.Lock()
+
+def too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds {MEDIA_MAX_UPLOAD_BYTES} bytes")
+
+def file_path(url: str) -> str:
+    return os.path.join(UPLOAD_DIR, url.split("/")[-1])
+
+def hash_file(path: str) -> Tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(MEDIA_CHUNK_BYTES), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+class UploadWriter:
+    """The file part of an upload, written to a temp file in UPLOAD_DIR as it
+    arrives and hashed on the way. Blocking; call it from a worker thread."""
+
+    def __init__(self, filename: Optional[str], content_type: Optional[str]):
+        self.filename = filename
+        self.content_type = content_type
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.tmp: Optional[str] = None
+        self._out: Optional[BinaryIO] = None
+
+    def _open(self) -> BinaryIO:
+        if self._out is None:
+            fd, self.tmp = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+            self._out = os.fdopen(fd, "wb")
+        return self._out
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > MEDIA_MAX_UPLOAD_BYTES:
+            raise too_large()
+        self.digest.update(chunk)
+        self._open().write(chunk)
+
+    def finish(self) -> Tuple[str, str, bool]:
+        """Move the temp file to its content-derived name, or drop it when that
+        file already exists; returns (sha256, stored name, whether the file is new)."""
+        self._open().close()
+        name = self.digest.hexdigest()[:32] + os.path.splitext(self.filename or "")[1].lower()
+        target = os.path.join(UPLOAD_DIR, name)
+        created = not os.path.exists(target)
+        if created:
+            os.replace(self.tmp, target)
+        else:
+            os.remove(self.tmp)
+        return self.digest.hexdigest(), name, created
+
+    def abort(self) -> None:
+        if self._out is not None:
+            self._out.close()
+        if self.tmp is not None and os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+def _decode(value: bytes) -> str:
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return value.decode("latin-1")
+
+class _FilePart:
+    """Multipart parser callbacks that keep the bytes of one file field and
+    skip every other part."""
+
+    def __init__(self, field: str):
+        self.field = field
+        self.headers: Dict[bytes, bytes] = {}
+        self._name = b""
+        self._value = b""
+        self.upload: Optional[UploadWriter] = None
+        self.reading = False
+        self.pending = bytearray()
+
+    def on_part_begin(self):
+        self.headers = {}
+
+    def on_header_field(self, data, start, end):
+        self._name += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[self._name.lower()] = self._value
+        self._name = self._value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        # Only the first part under the field name that carries a filename
+        self.reading = self.upload is None and options.get(b"name") == self.field.encode() and b"filename" in options
+        if self.reading:
+            content_type = self.headers.get(b"content-type")
+            self.upload = UploadWriter(_decode(options[b"filename"]), _decode(content_type) if content_type else None)
+
+    def on_part_data(self, data, start, end):
+        if self.reading:
+            self.pending += data[start:end]
+
+    def on_part_end(self):
+        self.reading = False
+
+async def receive_upload(request: Request, field: str = "file") -> UploadWriter:
+    """Stream the file field of a multipart request body into UPLOAD_DIR,
+    without spooling it anywhere else first. Disk writes happen in a worker
+    thread, MEDIA_CHUNK_BYTES at a time."""
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=422, detail="Expected a multipart/form-data body")
+    part = _FilePart(field)
+    parser = MultipartParser(params[b"boundary"], {
+        name: getattr(part, name) for name in (
+            "on_part_begin", "on_header_field", "on_header_value", "on_header_end",
+            "on_headers_finished", "on_part_data", "on_part_end",
+        )
+    })
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except MultipartParseError:
+                raise HTTPException(status_code=400, detail="Malformed multipart body")
+            if len(part.pending) >= MEDIA_CHUNK_BYTES:
+                data, part.pending = bytes(part.pending), bytearray()
+                await run_in_threadpool(part.upload.write, data)
+        parser.finalize()
+        if part.upload is None:
+            raise HTTPException(status_code=422, detail=f"No file in the '{field}' field")
+        await run_in_threadpool(part.upload.write, bytes(part.pending))
+        return part.upload
+    except BaseException:
+        if part.upload is not None:
+            part.upload.abort()
+        raise
+
+def save_upload(session: Session, upload: UploadWriter) -> Tuple[MediaAsset, bool]:
+    """Store a received upload (blocking; run it in a worker thread). Returns
+    the asset and whether an existing one was reused."""
+    try:
+        digest, name, created = upload.finish()
+    except BaseException:
+        upload.abort()
+        raise
+    filename, content_type, size = upload.filename, upload.content_type, upload.size
+    with _lock:
+        existing = session.exec(
+            select(MediaAsset).where(MediaAsset.content_hash == digest).order_by(MediaAsset.id)
+        ).first()
+        if existing is not None:
+            if not os.path.exists(file_path(existing.url)):
+                # The row outlived its file: point it at the copy we just stored
+                existing.url = f"{UPLOAD_URL}/{name}"
+                session.add(existing)
+                session.commit()
+                session.refresh(existing)
+            elif created and file_path(existing.url) != os.path.join(UPLOAD_DIR, name):
+                os.remove(os.path.join(UPLOAD_DIR, name))
+            return existing, True
+        asset = MediaAsset(
+            filename=filename or name,
+            url=f"{UPLOAD_URL}/{name}",
+            file_type=content_type or "application/octet-stream",
+            content_hash=digest,
+            size=size,
+        )
+        session.add(asset)
+        session.commit()
+        session.refresh(asset)
+        return asset, False
+
+def delete_file(session: Session, asset: MediaAsset) -> None:
+    # Leave the file if another row still points at it
+    shared = session.exec(select(MediaAsset.id).where(MediaAsset.url == asset.url, MediaAsset.id != asset.id)).first()
+    path = file_path(asset.url)
+    if shared is None and os.path.exists(path):
+        os.remove(path)
+
+def backfill_hashes(session: Session) -> int:
+    """Hash the files of assets uploaded before hashes were recorded, so new
+    uploads can be matched against them."""
+    done = 0
+    for asset in session.exec(select(MediaAsset).where(MediaAsset.content_hash == None)).all():
+        path = file_path(asset.url)
+        if not os.path.exists(path):
+            continue
+        asset.content_hash, asset.size = hash_file(path)
+        session.add(asset)
+        done += 1
+    session.commit()
+    return done
+
+class UploadSizeLimit:
+    """ASGI middleware that stops oversized request bodies on the upload route
+    before they are read."""
+
+    def __init__(self, app, path: str, max_bytes: int = MEDIA_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].rstrip("/") != self.path:
+            return await self.app(scope, receive, send)
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": too_large().detail}, status_code=413)
+            return await response(scope, receive, send)
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            if received > self.max_bytes:
+                # Chunked bodies have no Content-Length; raised inside the app, so it becomes a 413
+                raise too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
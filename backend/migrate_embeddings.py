@@ -0,0 +1,67 @@
+import json
+import sys
+from sqlalchemy import inspect, or_, text
+from sqlmodel import Session, select
+from database import engine, create_db_and_tables
+from models import EmbeddingDocument, ChunkEmbedding
+from vector_index import encode_vector, decode_vector
+from indexer import content_hash
+
+TABLE = EmbeddingDocument.__tablename__
+
+def relax_json_column():
+    # embedding_json used to be NOT NULL; new rows only carry the binary vector.
+    cols = {c["name"]: c for c in inspect(engine).get_columns(TABLE)}
+    if cols["embedding_json"]["nullable"]:
+        return
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"ALTER TABLE {TABLE} ALTER COLUMN embedding_json DROP NOT NULL"))
+            return
+        # SQLite cannot alter constraints, so rebuild the table from the model
+        old_cols = ", ".join(f'"{name}"' for name in cols)
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_old"))
+        for index in EmbeddingDocument.__table__.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        EmbeddingDocument.__table__.create(conn)
+        conn.execute(text(f"INSERT INTO {TABLE} ({old_cols}) SELECT {old_cols} FROM {TABLE}_old"))
+        conn.execute(text(f"DROP TABLE {TABLE}_old"))
+
+def convert_rows(batch_size: int = 500) -> int:
+    """Move per-row vectors (legacy JSON or binary) into the shared chunk_embeddings table."""
+    converted = 0
+    with Session(engine) as session:
+        while True:
+            docs = session.exec(
+                select(EmbeddingDocument)
+                .where(or_(EmbeddingDocument.embedding != None, EmbeddingDocument.embedding_json != None))
+                .limit(batch_size)
+            ).all()
+            if not docs:
+                break
+            hashes = {doc.id: doc.content_hash or content_hash(doc.text) for doc in docs}
+            stored = set(session.exec(select(ChunkEmbedding.content_hash).where(ChunkEmbedding.content_hash.in_(list(hashes.values())))).all())
+            for doc in docs:
+                h = hashes[doc.id]
+                if h not in stored:
+                    if doc.embedding is not None:
+                        blob, dim, norm = encode_vector(decode_vector(doc.embedding))
+                    else:
+                        blob, dim, norm = encode_vector(json.loads(doc.embedding_json))
+                    session.add(ChunkEmbedding(content_hash=h, embedding=blob, dim=dim, norm=norm))
+                    stored.add(h)
+                doc.content_hash = h
+                doc.embedding, doc.dim, doc.norm = None, None, None
+                doc.embedding_json = None
+                session.add(doc)
+            session.commit()
+            converted += len(docs)
+            print(f"Converted {converted} rows...")
+    return converted
+
+if __name__ == "__main__":
+    create_db_and_tables()
+    relax_json_column()
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    total = convert_rows(batch_size)
+    print(f"Done. {total} embeddings moved to chunk_embeddings.")
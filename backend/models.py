@@ -1,5 +1,6 @@
 from typing import Optional, List
 from sqlmodel import Field, SQLModel, Relationship
+from sqlalchemy import Column, Index, LargeBinary
 from datetime import datetime
 
 # 1. Admin Authentication
@@ -34,10 +35,10 @@ class Product(SQLModel, table=True):
     images: Optional[str] = None # JSON list of additional images
     price: Optional[float] = None
     stock_status: str = Field(default="in_stock")
-    is_active: bool = Field(default=True)
+    is_active: bool = Field(default=True, index=True)
     seo_title: Optional[str] = None
     seo_description: Optional[str] = None
-    category_id: Optional[int] = Field(default=None, foreign_key="categories.id")
+    category_id: Optional[int] = Field(default=None, foreign_key="categories.id", index=True)
     category: Optional[Category] = Relationship(back_populates="products")
 
 # 3. Inquiries System
@@ -84,6 +85,8 @@ class MediaAsset(SQLModel, table=True):
     url: str
     file_type: str
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)
+    content_hash: Optional[str] = Field(default=None, index=True) # SHA-256 of the file
+    size: Optional[int] = None
 
 # 5. Market Coverage
 class Region(SQLModel, table=True):
@@ -125,11 +128,40 @@ class EmbeddingDocument(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     source_type: str = Field(index=True)
     source_id: Optional[str] = Field(default=None, index=True)
+    chunk_index: Optional[int] = None
     text: str
-    embedding_json: str
+    embedding_json: Optional[str] = None # Legacy JSON vector, superseded by chunk_embeddings
+    embedding: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary)) # Legacy per-row vector, superseded by chunk_embeddings
+    dim: Optional[int] = None
+    norm: Optional[float] = None
+    content_hash: Optional[str] = Field(default=None, index=True) # sha256 of embed model + normalized text
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class ChunkEmbedding(SQLModel, table=True):
+    # One vector per unique chunk, shared by every document row with that hash
+    __tablename__ = "chunk_embeddings"
+    content_hash: str = Field(primary_key=True)
+    embedding: bytes = Field(sa_column=Column(LargeBinary, nullable=False)) # Little-endian float32
+    dim: int
+    norm: float
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ReindexJobRecord(SQLModel, table=True):
+    # Reindex progress, shared so any worker can answer a poll
+    __tablename__ = "reindex_jobs"
+    # Only a queued or running job holds "reindex" here, so the unique index lets one job claim it at a time
+    __table_args__ = (Index("ux_reindex_jobs_active", "active", unique=True),)
+    id: str = Field(primary_key=True)
+    status: str = Field(index=True)
+    active: Optional[str] = None
+    full: bool = Field(default=False)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow) # Heartbeat while running
+    state: str = "{}" # JSON counters and recent errors
+
 class ChatSession(SQLModel, table=True):
     __tablename__ = "chat_sessions"
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -138,6 +170,7 @@ class ChatSession(SQLModel, table=True):
 
 class ChatMessage(SQLModel, table=True):
     __tablename__ = "chat_messages"
+    __table_args__ = (Index("ix_chat_messages_session_id_created_at", "session_id", "created_at"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     session_id: str = Field(index=True)
     role: str
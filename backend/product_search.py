@@ -0,0 +1,146 @@
+import re
+import html
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select, func
+from database import engine
+from models import Product, Category
+
+# Full-text index over products kept beside the products table: an FTS5 table
+# on SQLite, a GIN-indexed tsvector table on Postgres. Rows hold name,
+# description, rich_description with tags stripped, and the category name, and
+# are rewritten by the product and category write paths.
+
+POSTGRES_DDL = [
+    "CREATE TABLE IF NOT EXISTS product_search ("
+    " product_id INTEGER PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,"
+    " document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_product_search_document ON product_search USING GIN (document)",
+]
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    "name, description, body, category, tokenize='unicode61 remove_diacritics 2')",
+]
+# bm25 column weights on SQLite: name, description, body, category
+SQLITE_WEIGHTS = "10.0, 4.0, 1.0, 2.0"
+POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector('simple', :name), 'A') || "
+    "setweight(to_tsvector('simple', :description), 'B') || "
+    "setweight(to_tsvector('simple', :category), 'B') || "
+    "setweight(to_tsvector('simple', :body), 'C')"
+)
+MAX_QUERY_TERMS = 8
+
+# False when the SQLite build lacks FTS5; search then falls back to LIKE
+available = True
+
+def is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+def strip_html(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    value = re.sub(r"(?is)<(script|style)\b.*?</\1>", " ", value)
+    return " ".join(html.unescape(re.sub(r"<[^>]+>", " ", value)).split())
+
+def query_terms(q: str) -> List[str]:
+    return re.findall(r"\w+", q.lower())[:MAX_QUERY_TERMS]
+
+def _documents(session: Session, ids: Optional[Sequence[int]] = None) -> List[dict]:
+    query = select(Product.id, Product.name, Product.description, Product.rich_description, Category.name).outerjoin(
+        Category, Category.id == Product.category_id
+    )
+    if ids is not None:
+        query = query.where(Product.id.in_(ids))
+    return [
+        {"id": pid, "name": name or "", "description": description or "", "body": strip_html(rich), "category": category or ""}
+        for pid, name, description, rich, category in session.exec(query).all()
+    ]
+
+def _delete(session: Session, ids: Optional[Sequence[int]] = None):
+    table, key = ("product_search", "product_id") if is_postgres() else ("products_fts", "rowid")
+    if ids is None:
+        session.execute(text(f"DELETE FROM {table}"))
+        return
+    for i in range(0, len(ids), 500):
+        batch = list(ids[i:i + 500])
+        marks = ", ".join(f":id{j}" for j in range(len(batch)))
+        session.execute(text(f"DELETE FROM {table} WHERE {key} IN ({marks})"), {f"id{j}": v for j, v in enumerate(batch)})
+
+def _insert(session: Session, docs: List[dict]):
+    if not docs:
+        return
+    if is_postgres():
+        sql = f"INSERT INTO product_search (product_id, document) VALUES (:id, {POSTGRES_DOCUMENT})"
+    else:
+        sql = "INSERT INTO products_fts (rowid, name, description, body, category) VALUES (:id, :name, :description, :body, :category)"
+    session.execute(text(sql), docs)
+
+def index_products(session: Session, ids: Sequence[int]) -> None:
+    """Rewrite the index rows for these products; ids that no longer exist are removed."""
+    ids = [i for i in ids if i is not None]
+    if not available or not ids:
+        return
+    _delete(session, ids)
+    _insert(session, _documents(session, ids))
+    session.commit()
+
+def index_category(session: Session, category_id: int) -> None:
+    index_products(session, session.exec(select(Product.id).where(Product.category_id == category_id)).all())
+
+def rebuild(session: Session) -> int:
+    if not available:
+        return 0
+    docs = _documents(session)
+    _delete(session)
+    for i in range(0, len(docs), 500):
+        _insert(session, docs[i:i + 500])
+    session.commit()
+    return len(docs)
+
+def ensure_search_index() -> None:
+    """Create the index if missing and rebuild it when it is out of step with products."""
+    global available
+    try:
+        with engine.begin() as conn:
+            for ddl in POSTGRES_DDL if is_postgres() else SQLITE_DDL:
+                conn.execute(text(ddl))
+    except OperationalError as e:
+        available = False
+        print(f"Full-text search unavailable, falling back to LIKE: {e}")
+        return
+    table = "product_search" if is_postgres() else "products_fts"
+    with Session(engine) as session:
+        indexed = session.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+        if indexed != session.exec(select(func.count(Product.id))).one():
+            rebuild(session)
+
+def search(session: Session, q: str, limit: int = 20, include_inactive: bool = False) -> List[Tuple[int, float]]:
+    """(product_id, score) best first; every term matches as a prefix, for autocomplete."""
+    terms = query_terms(q)
+    if not terms:
+        return []
+    active = "" if include_inactive else "AND p.is_active = :active"
+    params = {"limit": limit, "active": True}
+    if not available:
+        like = select(Product.id).where(*[Product.name.ilike(f"%{t}%") | Product.description.ilike(f"%{t}%") for t in terms])
+        if not include_inactive:
+            like = like.where(Product.is_active == True)
+        return [(pid, 0.0) for pid in session.exec(like.order_by(Product.id).limit(limit)).all()]
+    if is_postgres():
+        params["q"] = " & ".join(f"{t}:*" for t in terms)
+        sql = (
+            "SELECT s.product_id, ts_rank(s.document, query) AS score "
+            "FROM product_search s JOIN products p ON p.id = s.product_id, to_tsquery('simple', :q) query "
+            f"WHERE s.document @@ query {active} ORDER BY score DESC, s.product_id LIMIT :limit"
+        )
+    else:
+        params["q"] = " AND ".join(f'"{t}"*' for t in terms)
+        # bm25() is lower for better matches
+        sql = (
+            f"SELECT products_fts.rowid, -bm25(products_fts, {SQLITE_WEIGHTS}) AS score "
+            "FROM products_fts JOIN products p ON p.id = products_fts.rowid "
+            f"WHERE products_fts MATCH :q {active} ORDER BY score DESC, products_fts.rowid LIMIT :limit"
+        )
+    return [(pid, float(score)) for pid, score in session.execute(text(sql), params).all()]
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi import Response
+from http_cache import versions
+from fast_json import dumps
+
+# Read-through cache for public catalog and content reads. Entries are the
+# serialized response body plus any extra headers, keyed by the request and
+# the version stamps of the collections it reads, so a bump makes every
+# dependent entry unreachable on all workers. Bumps also drop this worker's
+# dependent entries right away.
+#
+# In-process LRU by default; READ_CACHE_REDIS_URL selects a shared Redis
+# store (needs the redis package). Any object with get/set/delete/clear can
+# be plugged in with set_store().
+
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", "512"))
+READ_CACHE_TTL_SECONDS = float(os.getenv("READ_CACHE_TTL_SECONDS", "300"))
+READ_CACHE_REDIS_URL = os.getenv("READ_CACHE_REDIS_URL")
+
+class MemoryStore:
+    def __init__(self, max_entries: int = READ_CACHE_SIZE, ttl: float = READ_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._items: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key: str, value: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def delete(self, keys: List[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+class RedisStore:
+    def __init__(self, url: str, ttl: float = READ_CACHE_TTL_SECONDS, prefix: str = "te:read:"):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = max(1, int(ttl))
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes) -> None:
+        self.client.setex(self.prefix + key, self.ttl, value)
+
+    def delete(self, keys: List[str]) -> None:
+        if keys:
+            self.client.delete(*[self.prefix + k for k in keys])
+
+    def clear(self) -> None:
+        # Old entries are unreachable once versions move on and expire with the TTL
+        pass
+
+def _encode(body: bytes, headers: Dict[str, str]) -> bytes:
+    return json.dumps(headers).encode("utf-8") + b"\n" + body
+
+def _decode(entry: bytes) -> Tuple[bytes, Dict[str, str]]:
+    head, body = entry.split(b"\n", 1)
+    return body, json.loads(head)
+
+def render(value) -> bytes:
+    return dumps(value)
+
+class ReadCache:
+    def __init__(self, store):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.invalidations = 0
+        # collection -> keys this worker stored, for eager invalidation
+        self._keys: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, response: Response, key: str, names: Tuple[str, ...], loader: Callable[[], object], headers: Optional[Dict[str, str]] = None) -> Response:
+        """Serve key from the cache or call loader(), which may fill headers with
+        extra response headers; both are cached together."""
+        key = key + "|" + "|".join(f"{n}={versions.get(n)[0]}" for n in names)
+        entry = None
+        try:
+            entry = self.store.get(key)
+        except Exception:
+            self.errors += 1
+        if entry is not None:
+            self.hits += 1
+            body, extra = _decode(entry)
+        else:
+            self.misses += 1
+            extra = headers if headers is not None else {}
+            body = render(loader())
+            try:
+                self.store.set(key, _encode(body, extra))
+            except Exception:
+                self.errors += 1
+            with self._lock:
+                for n in names:
+                    keys = self._keys.setdefault(n, set())
+                    if len(keys) >= 4 * READ_CACHE_SIZE:
+                        # Only an optimisation: versioned keys already stop stale hits
+                        keys.clear()
+                    keys.add(key)
+        return Response(content=body, media_type="application/json", headers={**response.headers, **extra})
+
+    def invalidate(self, *names: str) -> None:
+        with self._lock:
+            keys = set()
+            for n in names:
+                keys |= self._keys.pop(n, set())
+            self.invalidations += 1
+        try:
+            self.store.delete(list(keys))
+        except Exception:
+            self.errors += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys.clear()
+        self.store.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.store).__name__,
+            "entries": len(self.store) if hasattr(self.store, "__len__") else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "errors": self.errors,
+            "invalidations": self.invalidations,
+        }
+
+def _default_store():
+    if READ_CACHE_REDIS_URL:
+        try:
+            return RedisStore(READ_CACHE_REDIS_URL)
+        except ImportError:
+            print("READ_CACHE_REDIS_URL is set but redis is not installed; using the in-process cache")
+    return MemoryStore()
+
+cache = ReadCache(_default_store())
+versions.listeners.append(lambda *names, ids=None: cache.invalidate(*names))
+
+def set_store(store) -> None:
+    cache.store = store
+    cache.clear()
@@ -0,0 +1,51 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session, select
+from database import get_session
+from models import Banner, AdminUser
+from auth import get_current_user
+from http_cache import cacheable, bump
+
+router = APIRouter(prefix="/banners", tags=["Banners"])
+
+@router.get("/", response_model=List[Banner], dependencies=[cacheable("banners")])
+def read_banners(position: Optional[str] = None, include_inactive: bool = False, session: Session = Depends(get_session)):
+    query = select(Banner)
+    if position:
+        query = query.where(Banner.position == position)
+    if not include_inactive:
+        query = query.where(Banner.is_active == True)
+    return session.exec(query.order_by(Banner.position, Banner.display_order, Banner.id)).all()
+
+@router.post("/", response_model=Banner)
+def create_banner(banner: Banner, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
+    session.add(banner)
+    session.commit()
+    bump("banners")
+    session.refresh(banner)
+    return banner
+
+@router.put("/{banner_id}", response_model=Banner)
+def update_banner(banner_id: int, banner_data: Banner, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
+    banner = session.get(Banner, banner_id)
+    if not banner:
+        raise HTTPException(status_code=404, detail="Banner not found")
+    banner_data_dict = banner_data.dict(exclude_unset=True)
+    banner_data_dict.pop("id", None)
+    for key, value in banner_data_dict.items():
+        setattr(banner, key, value)
+    session.add(banner)
+    session.commit()
+    bump("banners")
+    session.refresh(banner)
+    return banner
+
+@router.delete("/{banner_id}")
+def delete_banner(banner_id: int, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
+    banner = session.get(Banner, banner_id)
+    if not banner:
+        raise HTTPException(status_code=404, detail="Banner not found")
+    session.delete(banner)
+    session.commit()
+    bump("banners")
+    return {"ok": True}
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+from models import AdminUser
+from auth import get_current_user
+from read_cache import cache as read_cache
+from static_catalog import publisher
+
+router = APIRouter(prefix="/cache", tags=["Cache"])
+
+@router.get("/stats")
+def read_cache_stats(current_user: AdminUser = Depends(get_current_user)):
+    return read_cache.stats()
+
+@router.post("/clear")
+def clear_cache(current_user: AdminUser = Depends(get_current_user)):
+    read_cache.clear()
+    return {"ok": True}
+
+@router.post("/publish")
+def publish_static_catalog(current_user: AdminUser = Depends(get_current_user)):
+    """Rebuild every static catalog file; only changed files are rewritten."""
+    return publisher.publish()
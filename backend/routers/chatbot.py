@@ -1,23 +1,36 @@
 import os
 import json
-import math
+import time
 import uuid
-import google.generativeai as genai
+import logging
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
 from sqlmodel import Session, select
-from database import get_session
-from models import ChatbotKnowledge, AdminUser, SiteContent, Product, EmbeddingDocument, ChatSession, ChatMessage
+from database import get_session, engine
+from models import ChatbotKnowledge, AdminUser, ChatMessage
 from auth import get_current_user
+import llm
+from indexer import index_knowledge, start_job, get_job, run_reindex
+from vector_index import index as vector_index, corpus_stamp
+from bm25_index import index as bm25_index, reciprocal_rank_fusion
+from answer_cache import cache as answer_cache, normalize_question, answer_version
+from http_cache import bump
+from chat_history import load_history, save_exchange, CHAT_HISTORY_TURNS
+from chat_retention import run_retention
+from context_snapshot import store as context_snapshot
+from intent_matcher import store as intent_matcher
+from fast_json import list_response
 from pydantic import BaseModel
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-pro')
-EMBED_MODEL = 'models/text-embedding-004'
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chatbot", tags=["Chatbot"])
 
+# Hits taken from each retriever before reciprocal rank fusion
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+
 class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
@@ -30,44 +43,46 @@ class ChatResponse(BaseModel):
     kind: str = "answer"
     suggestions: Optional[List[str]] = None
 
-# --- Helper: Build Context from DB ---
-def embed_text(text: str) -> List[float]:
-    r = genai.embed_content(model=EMBED_MODEL, content=text)
-    return r['embedding']
-
-def cosine(a: List[float], b: List[float]) -> float:
-    dp = sum(x*y for x, y in zip(a, b))
-    na = math.sqrt(sum(x*x for x in a))
-    nb = math.sqrt(sum(x*x for x in b))
-    if na == 0 or nb == 0:
-        return 0.0
-    return dp / (na * nb)
-
-def chunk(text: str, size: int = 1000, overlap: int = 200) -> List[str]:
-    if len(text) <= size:
-        return [text]
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = min(start + size, len(text))
-        chunks.append(text[start:end])
-        if end == len(text):
-            break
-        start = max(0, end - overlap)
-    return chunks
-
 # --- Knowledge Base Management (Admin Only) ---
 
+def sync_knowledge(session: Session, response: Response, background_tasks: BackgroundTasks, item_id: int, item: Optional[ChatbotKnowledge] = None):
+    if index_knowledge(session, item_id, item).failed:
+        # The row is saved but not searchable yet: retry its chunks in a
+        # background reindex and answer 202 with the job to poll
+        job, created = start_job()
+        if created:
+            background_tasks.add_task(run_reindex, job)
+        response.status_code = status.HTTP_202_ACCEPTED
+        response.headers["X-Reindex-Job"] = job.id
+
 @router.post("/knowledge", response_model=ChatbotKnowledge)
-def create_knowledge(item: ChatbotKnowledge, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
+def create_knowledge(item: ChatbotKnowledge, response: Response, background_tasks: BackgroundTasks, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
     session.add(item)
     session.commit()
+    sync_knowledge(session, response, background_tasks, item.id, item)
+    bump("knowledge")
     session.refresh(item)
     return item
 
 @router.get("/knowledge", response_model=List[ChatbotKnowledge])
 def read_knowledge(session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
-    return session.exec(select(ChatbotKnowledge)).all()
+    return list_response(session, ChatbotKnowledge, ChatbotKnowledge.id)
+
+@router.put("/knowledge/{item_id}", response_model=ChatbotKnowledge)
+def update_knowledge(item_id: int, item_data: ChatbotKnowledge, response: Response, background_tasks: BackgroundTasks, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
+    item = session.get(ChatbotKnowledge, item_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    item_data_dict = item_data.dict(exclude_unset=True)
+    item_data_dict.pop("id", None)
+    for key, value in item_data_dict.items():
+        setattr(item, key, value)
+    session.add(item)
+    session.commit()
+    sync_knowledge(session, response, background_tasks, item.id, item)
+    bump("knowledge")
+    session.refresh(item)
+    return item
 
 @router.delete("/knowledge/{item_id}")
 def delete_knowledge(item_id: int, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
@@ -76,191 +91,260 @@ def delete_knowledge(item_id: int, session: Session = Depends(get_session), curr
         raise HTTPException(status_code=404, detail="Item not found")
     session.delete(item)
     session.commit()
+    index_knowledge(session, item_id)
+    bump("knowledge")
     return {"ok": True}
 
-@router.post("/reindex")
-def reindex(session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
-    docs = session.exec(select(EmbeddingDocument)).all()
-    for d in docs:
-        session.delete(d)
-    session.commit()
-    items: List[tuple] = []
-    include_kb = os.getenv("RAG_INCLUDE_KB", "false").lower() == "true"
-    if include_kb:
-        kb = session.exec(select(ChatbotKnowledge).where(ChatbotKnowledge.is_active == True)).all()
-        for k in kb:
-            for c in chunk(f"{k.question}\n{k.answer}"):
-                items.append(("knowledge", str(k.id), c))
-    content = session.exec(select(SiteContent)).all()
-    for s in content:
-        for c in chunk(f"{s.key}: {s.value}"):
-            items.append(("content", s.key, c))
-    products = session.exec(select(Product).where(Product.is_active == True)).all()
-    for p in products:
-        base = f"Product: {p.name}\nDescription: {p.description or ''}"
-        for c in chunk(base):
-            items.append(("product", str(p.id), c))
-    for source_type, source_id, text in items:
-        emb = embed_text(text)
-        doc = EmbeddingDocument(source_type=source_type, source_id=source_id, text=text, embedding_json=json.dumps(emb))
-        session.add(doc)
-    session.commit()
-    return {"indexed": len(items)}
+@router.post("/reindex", status_code=status.HTTP_202_ACCEPTED)
+def reindex(background_tasks: BackgroundTasks, full: bool = False, current_user: AdminUser = Depends(get_current_user)):
+    job, created = start_job(full)
+    if created:
+        background_tasks.add_task(run_reindex, job)
+    return job.to_dict()
 
-@router.post("/ask", response_model=ChatResponse)
-async def ask_chatbot(request: ChatRequest, session: Session = Depends(get_session)):
+@router.get("/reindex/{job_id}")
+def read_reindex_job(job_id: str, current_user: AdminUser = Depends(get_current_user)):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.post("/history/retention")
+def run_chat_retention(dry_run: bool = False, vacuum: bool = False, current_user: AdminUser = Depends(get_current_user)):
+    report = run_retention(dry_run=dry_run, vacuum=vacuum)
+    if report is None:
+        raise HTTPException(status_code=409, detail="Retention is already running")
+    return report
+
+@router.get("/cache/stats")
+def read_cache_stats(current_user: AdminUser = Depends(get_current_user)):
+    return answer_cache.stats()
+
+# --- Ask ---
+
+SYSTEM_PROMPT = (
+    "You are a helpful and professional AI Support Agent for Trans Emirates Company. "
+    "Use only the following context to answer the user. "
+    "If the answer is not present, say: I don't have that information."
+)
+
+def is_grounded(ans: Optional[str]) -> bool:
+    return bool(ans) and "I don't have that information" not in ans and "I do not have" not in ans
+
+def save_reply(session: Session, plan: dict, reply: dict) -> dict:
+    sid = plan["sid"]
+    messages = [plan["user_message"]]
+    if reply.get("answer"):
+        messages.append(ChatMessage(session_id=sid, role="assistant", content=reply["answer"]))
+    save_exchange(session, sid, plan["prior"], messages, plan["new_session"])
+    return {**reply, "session_id": sid}
+
+def prepare_answer(session: Session, request: ChatRequest) -> dict:
+    """Everything before the LLM call. Returns the final reply under "reply" when
+    no generation is needed, otherwise the prompt and the reply metadata."""
     q = request.message
-    sid = request.session_id or str(uuid.uuid4())
-    existing = session.exec(select(ChatSession).where(ChatSession.session_id == sid)).first()
-    if not existing:
-        session.add(ChatSession(session_id=sid))
-        session.commit()
-    session.add(ChatMessage(session_id=sid, role="user", content=q))
-    session.commit()
-    history_items: List[ChatMessage] = session.exec(
-        select(ChatMessage).where(ChatMessage.session_id == sid).order_by(ChatMessage.created_at)
-    ).all()
-    history = []
-    for h in history_items[-6:]:
-        history.append(f"{h.role.capitalize()}: {h.content}")
+    if request.session_id:
+        sid = request.session_id
+        prior, exists = load_history(session, sid)
+    else:
+        sid, prior, exists = str(uuid.uuid4()), [], False
+    # Written together with the answer in save_reply
+    exchange = {
+        "sid": sid,
+        "prior": prior,
+        "new_session": not exists,
+        "user_message": ChatMessage(session_id=sid, role="user", content=q),
+    }
+    history = [f"{role.capitalize()}: {content}" for role, content in (prior + [("user", q)])[-CHAT_HISTORY_TURNS:]]
     uq = q.lower()
+    # One aggregate serves both indexes
+    stamp = corpus_stamp(session)
+    vector_index.ensure_fresh(session, stamp)
+    bm25_index.ensure_fresh(session, stamp)
+    # Only standalone questions are cached; follow-ups depend on the conversation
+    cache_key = normalize_question(q) if not prior else None
+    # Cached answers also retire when content, products or knowledge change on any worker
+    index_version = answer_version(vector_index.version)
+    if cache_key:
+        cached = answer_cache.get(cache_key, index_version)
+        if cached:
+            return {**exchange, "reply": cached}
     try:
-        q_emb = embed_text(q)
+        q_emb = llm.embed_text(q)
     except Exception:
         q_emb = None
+    if cache_key and q_emb is None:
+        answer_cache.miss()
+    elif cache_key:
+        cached = answer_cache.get_similar(q_emb, index_version)
+        if cached:
+            return {**exchange, "reply": cached}
     include_kb = os.getenv("RAG_INCLUDE_KB", "false").lower() == "true"
-    rows = session.exec(select(EmbeddingDocument)).all()
-    rows = [r for r in rows if r.source_type in (("content", "product", "knowledge") if include_kb else ("content", "product"))]
-    if not rows:
-        content_items = session.exec(select(SiteContent)).all()
-        products = session.exec(select(Product).where(Product.is_active == True)).all()
-        kb_items = session.exec(select(ChatbotKnowledge).where(ChatbotKnowledge.is_active == True)).all() if include_kb else []
-        context = ""
-        if content_items:
-            context += "SITE CONTENT:\n" + "\n".join([f"{c.key}: {c.value}" for c in content_items]) + "\n\n"
-        if products:
-            context += "PRODUCTS:\n" + "\n".join([f"{p.name}: {p.description or ''}" for p in products])
-        if kb_items:
-            context += "\n\nKNOWLEDGE:\n" + "\n\n".join([f"Q: {k.question}\nA: {k.answer}" for k in kb_items])
-        if not context.strip():
-            return {"answer": None, "found": False, "sources": [], "session_id": sid}
-        sys = (
-            "You are a helpful and professional AI Support Agent for Trans Emirates Company. "
-            "Use only the following context to answer the user. "
-            "If the answer is not present, say: I don't have that information."
-        )
-        prior = ("\n\nPrior conversation:\n" + "\n".join(history)) if history else ""
-        prompt = f"{sys}\n\nContext:\n{context}{prior}\n\nUser:\n{q}"
-        try:
-            resp = model.generate_content(prompt)
-            ans = resp.text.strip()
-            if "I don't have that information" in ans or "I do not have" in ans:
-                raise RuntimeError("Model did not find grounded answer")
-            srcs = []
-            session.add(ChatMessage(session_id=sid, role="assistant", content=ans))
-            session.commit()
-            return {"answer": ans, "found": True, "sources": srcs, "session_id": sid, "kind": "answer", "suggestions": ["About TE", "Our Products", "Contact Details"]}
-        except Exception:
-            pass
+    allowed_types = ("content", "product", "knowledge") if include_kb else ("content", "product")
+    has_docs = vector_index.count(allowed_types) > 0
     top = []
-    if q_emb is not None and rows:
-        scored = []
-        for r in rows:
-            emb = json.loads(r.embedding_json)
-            s = cosine(q_emb, emb)
-            scored.append((s, r))
-        scored.sort(key=lambda x: x[0], reverse=True)
-        top = [r for s, r in scored[:5] if s > 0.2]
+    if has_docs:
+        # Lexical hits keep retrieval bounded when the embedding call fails or scores low
+        vector_hits = vector_index.search(q_emb, k=RETRIEVAL_CANDIDATES, source_types=allowed_types, min_score=0.2) if q_emb is not None else []
+        lexical_hits = bm25_index.search(q, k=RETRIEVAL_CANDIDATES, source_types=allowed_types)
+        top = reciprocal_rank_fusion([vector_hits, lexical_hits], k=5)
     kb_context_parts: List[str] = []
     kb_srcs: List[dict] = []
-    if not include_kb and q_emb is not None:
-        kb_items = session.exec(select(ChatbotKnowledge).where(ChatbotKnowledge.is_active == True)).all()
-        kb_scored = []
-        for k in kb_items:
-            try:
-                emb = embed_text(f"{k.question}\n{k.answer}")
-                s = cosine(q_emb, emb)
-                kb_scored.append((s, k))
-            except Exception:
-                continue
-        kb_scored.sort(key=lambda x: x[0], reverse=True)
-        kb_top = [k for s, k in kb_scored[:3] if s > 0.25]
+    if not include_kb:
+        vector_kb = vector_index.search(q_emb, k=RETRIEVAL_CANDIDATES, source_types=("knowledge",), min_score=0.25) if q_emb is not None else []
+        lexical_kb = bm25_index.search(q, k=RETRIEVAL_CANDIDATES, source_types=("knowledge",))
+        kb_hits = reciprocal_rank_fusion([vector_kb, lexical_kb], k=3)
+        kb_ids = list(dict.fromkeys(int(h["source_id"]) for h in kb_hits))
+        kb_by_id = {}
+        if kb_ids:
+            kb_items = session.exec(
+                select(ChatbotKnowledge).where(ChatbotKnowledge.id.in_(kb_ids), ChatbotKnowledge.is_active == True)
+            ).all()
+            kb_by_id = {k.id: k for k in kb_items}
+        kb_top = [kb_by_id[i] for i in kb_ids if i in kb_by_id]
         for k in kb_top:
             kb_context_parts.append(f"Q: {k.question}\nA: {k.answer}")
             kb_srcs.append({"source_type": "knowledge", "source_id": str(k.id) if k.id is not None else None})
     if not top:
-        content_items = session.exec(select(SiteContent)).all()
-        products = session.exec(select(Product).where(Product.is_active == True)).all()
-        context = ""
-        if content_items:
-            context += "SITE CONTENT:\n" + "\n".join([f"{c.key}: {c.value}" for c in content_items]) + "\n\n"
-        if products:
-            context += "PRODUCTS:\n" + "\n".join([f"{p.name}: {p.description or ''}" for p in products])
+        # Precompiled, token-budgeted dump; knowledge is part of it only when it is not indexed
+        context = context_snapshot.get(session).texts[include_kb and not has_docs]
         if kb_context_parts:
             context += "\n\nKNOWLEDGE:\n" + "\n\n".join(kb_context_parts)
         if not context.strip():
-            return {"answer": None, "found": False, "sources": [], "session_id": sid}
+            return {**exchange, "reply": {"answer": None, "found": False, "sources": []}}
     else:
-        context = "\n\n".join([t.text for t in top] + (kb_context_parts if kb_context_parts else []))
-    sys = (
-        "You are a helpful and professional AI Support Agent for Trans Emirates Company. "
-        "Use only the following context to answer the user. "
-        "If the answer is not present, say: I don't have that information."
-    )
+        context = "\n\n".join([t["text"] for t in top] + kb_context_parts)
     prior = ("\n\nPrior conversation:\n" + "\n".join(history)) if history else ""
-    prompt = f"{sys}\n\nContext:\n{context}{prior}\n\nUser:\n{q}"
+    if has_docs:
+        suggestions = ["Ask about services", "Show contact details"]
+    else:
+        suggestions = ["About TE", "Our Products", "Contact Details"]
+    return {
+        **exchange,
+        "uq": uq,
+        "prompt": f"{SYSTEM_PROMPT}\n\nContext:\n{context}{prior}\n\nUser:\n{q}",
+        "sources": [{"source_type": t["source_type"], "source_id": t["source_id"]} for t in top] + kb_srcs,
+        "suggestions": suggestions,
+        "cache_key": cache_key,
+        "q_emb": q_emb,
+        "index_version": index_version,
+    }
+
+def complete_answer(session: Session, plan: dict, ans: Optional[str]) -> dict:
+    if is_grounded(ans):
+        reply = {"answer": ans, "found": True, "sources": plan["sources"], "kind": "answer", "suggestions": plan["suggestions"]}
+        if plan["cache_key"]:
+            answer_cache.put(plan["cache_key"], plan["q_emb"], reply, plan["index_version"])
+        return save_reply(session, plan, reply)
+    return save_reply(session, plan, fallback_reply(session, plan["uq"]))
+
+def fallback_reply(session: Session, uq: str) -> dict:
+    matcher = intent_matcher.get(session)
+    intents, kb_id = matcher.match(uq)
+    # Greetings fallback
+    if "greeting" in intents:
+        ans = "Hi! How can I help you today? You can ask about our company, services, or products."
+        return {"answer": ans, "found": True, "sources": [], "kind": "greeting", "suggestions": ["About TE", "Our Products", "Contact Details"]}
+    # Clarification for pricing/services/product queries
+    if "clarification" in intents:
+        ans = "Do you want details about a specific product or our services? Please specify."
+        return {"answer": ans, "found": True, "sources": [], "kind": "clarification", "suggestions": ["Product: Petroleum Jelly", "Product: Base Oil", "Our Services", "Contact Team"]}
+    # Simple deterministic fallbacks from SiteContent
+    content = context_snapshot.get(session).content
+    if content.get("about") and "about" in intents:
+        ans = content["about"]
+        return {"answer": ans, "found": True, "sources": [{"source_type": "content", "source_id": "about"}], "kind": "answer", "suggestions": ["Our Products", "Contact Details"]}
+    # Contact details fallback
+    if "contact" in intents:
+        details = []
+        for k in ["phone", "email", "address"]:
+            if content.get(k):
+                details.append(f"{k.capitalize()}: {content[k]}")
+        if details:
+            ans = "\n".join(details)
+            return {"answer": ans, "found": True, "sources": [{"source_type": "content", "source_id": "contact"}], "kind": "answer", "suggestions": ["Ask for a callback", "About TE"]}
+    # Knowledge base keyword match
+    if kb_id is not None:
+        ans = matcher.answers[kb_id]
+        return {"answer": ans, "found": True, "sources": [{"source_type": "knowledge", "source_id": str(kb_id)}], "kind": "answer", "suggestions": ["More details", "Contact Team"]}
+    return {"answer": None, "found": False, "sources": [], "kind": "fallback", "suggestions": ["Contact Team", "About TE", "Our Products"]}
+
+def generate(prompt: str) -> Optional[str]:
     try:
-        resp = model.generate_content(prompt)
-        ans = resp.text.strip()
-        if "I don't have that information" in ans or "I do not have" in ans:
-            raise RuntimeError("Model did not find grounded answer")
-        srcs = [{"source_type": t.source_type, "source_id": t.source_id} for t in top] + kb_srcs
-        session.add(ChatMessage(session_id=sid, role="assistant", content=ans))
-        session.commit()
-        return {"answer": ans, "found": True, "sources": srcs, "session_id": sid, "kind": "answer", "suggestions": ["Ask about services", "Show contact details"]}
+        return llm.generate(prompt).strip()
     except Exception:
-        # Greetings fallback
-        greet_terms = ["hi", "hello", "hey", "salam", "assalam", "assalamu", "assalam o alaikum", "asalam"]
-        if any(g in uq for g in greet_terms):
-            ans = "Hi! How can I help you today? You can ask about our company, services, or products."
-            session.add(ChatMessage(session_id=sid, role="assistant", content=ans))
-            session.commit()
-            return {"answer": ans, "found": True, "sources": [], "session_id": sid, "kind": "greeting", "suggestions": ["About TE", "Our Products", "Contact Details"]}
-        # Clarification for pricing/services/product queries
-        ambiguous_terms = ["price", "cost", "service", "services", "product", "products", "range"]
-        if any(term in uq for term in ambiguous_terms):
-            ans = "Do you want details about a specific product or our services? Please specify."
-            session.add(ChatMessage(session_id=sid, role="assistant", content=ans))
-            session.commit()
-            return {"answer": ans, "found": True, "sources": [], "session_id": sid, "kind": "clarification", "suggestions": ["Product: Petroleum Jelly", "Product: Base Oil", "Our Services", "Contact Team"]}
-        # Simple deterministic fallbacks from SiteContent
-        about_item = session.get(SiteContent, "about")
-        if about_item and ("what is te" in uq or "trans emirates" in uq or "about" in uq):
-            ans = about_item.value
-            session.add(ChatMessage(session_id=sid, role="assistant", content=ans))
-            session.commit()
-            return {"answer": ans, "found": True, "sources": [{"source_type": "content", "source_id": "about"}], "session_id": sid, "kind": "answer", "suggestions": ["Our Products", "Contact Details"]}
-        # Contact details fallback
-        keys = ["phone", "email", "address", "contact"]
-        if any(k in uq for k in keys):
-            content_items = session.exec(select(SiteContent)).all()
-            details = []
-            for k in ["phone", "email", "address"]:
-                it = session.get(SiteContent, k)
-                if it:
-                    details.append(f"{k.capitalize()}: {it.value}")
-            if details:
-                ans = "\n".join(details)
-                session.add(ChatMessage(session_id=sid, role="assistant", content=ans))
-                session.commit()
-                return {"answer": ans, "found": True, "sources": [{"source_type": "content", "source_id": "contact"}], "session_id": sid, "kind": "answer", "suggestions": ["Ask for a callback", "About TE"]}
-        # Knowledge base keyword match
-        kb = session.exec(select(ChatbotKnowledge).where(ChatbotKnowledge.is_active == True)).all()
-        for item in kb:
-            qwords = item.question.lower().split()
-            if any(w in uq for w in qwords):
-                ans = item.answer
-                session.add(ChatMessage(session_id=sid, role="assistant", content=ans))
-                session.commit()
-                return {"answer": ans, "found": True, "sources": [{"source_type": "knowledge", "source_id": str(item.id)}], "session_id": sid, "kind": "answer", "suggestions": ["More details", "Contact Team"]}
-        return {"answer": None, "found": False, "sources": [], "session_id": sid, "kind": "fallback", "suggestions": ["Contact Team", "About TE", "Our Products"]}
+        return None
+
+def server_timing(started: float, first_token: Optional[float] = None) -> dict:
+    now = time.perf_counter()
+    return {
+        "ttft_ms": round(((first_token or now) - started) * 1000, 1),
+        "total_ms": round((now - started) * 1000, 1),
+    }
+
+# Plain def so FastAPI runs the blocking SDK and DB calls in its threadpool
+@router.post("/ask", response_model=ChatResponse)
+def ask_chatbot(request: ChatRequest, response: Response, session: Session = Depends(get_session)):
+    started = time.perf_counter()
+    plan = prepare_answer(session, request)
+    if "reply" in plan:
+        result = save_reply(session, plan, plan["reply"])
+    else:
+        result = complete_answer(session, plan, generate(plan["prompt"]))
+    timing = server_timing(started)
+    response.headers["Server-Timing"] = f"total;dur={timing['total_ms']}"
+    return result
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/ask/stream")
+async def ask_chatbot_stream(request: ChatRequest):
+    """Server-Sent Events: a "meta" event with session and sources, "token" events
+    as the model generates, then "done" with the final reply and latencies.
+    "done" is authoritative: if the streamed text turns out to be ungrounded it
+    carries the fallback answer instead. A failure ends the stream with an
+    "error" event, so every stream has a terminal event."""
+    started = time.perf_counter()
+
+    async def events():
+        try:
+            async for event in answer_events():
+                yield event
+        except Exception:
+            logger.exception("Chat stream failed")
+            yield sse("error", {"detail": "The answer could not be completed", **server_timing(started)})
+
+    async def answer_events():
+        first_token = None
+        with Session(engine) as session:
+            plan = await run_in_threadpool(prepare_answer, session, request)
+            if "reply" in plan:
+                result = await run_in_threadpool(save_reply, session, plan, plan["reply"])
+                first_token = time.perf_counter()
+                yield sse("meta", {"session_id": result["session_id"], "sources": result.get("sources") or []})
+                if result.get("answer"):
+                    yield sse("token", {"text": result["answer"]})
+            else:
+                yield sse("meta", {"session_id": plan["sid"], "sources": plan["sources"]})
+                parts = []
+                try:
+                    stream = await run_in_threadpool(llm.generate_stream, plan["prompt"])
+                    async for text in iterate_in_threadpool(stream):
+                        if not text:
+                            continue
+                        if first_token is None:
+                            first_token = time.perf_counter()
+                        parts.append(text)
+                        yield sse("token", {"text": text})
+                    ans = "".join(parts).strip()
+                except Exception:
+                    ans = None
+                result = await run_in_threadpool(complete_answer, session, plan, ans)
+        yield sse("done", {**result, **server_timing(started, first_token)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,19 +1,20 @@
 from typing import List, Dict
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlmodel import Session, select
 from database import get_session
 from models import SiteContent, AdminUser, Page
 from auth import get_current_user
+from http_cache import cacheable, bump
+from read_cache import cache as read_cache
 
 router = APIRouter(prefix="/content", tags=["Site Content"])
 
 # --- Key-Value Content (for static sections like Hero) ---
 
-@router.get("/", response_model=Dict[str, str])
-def read_content(session: Session = Depends(get_session)):
-    content_items = session.exec(select(SiteContent)).all()
+@router.get("/", response_model=Dict[str, str], dependencies=[cacheable("content")])
+def read_content(response: Response, session: Session = Depends(get_session)):
     # Convert list of objects to a simple dict {key: value}
-    return {item.key: item.value for item in content_items}
+    return read_cache.fetch(response, "content", ("content",), lambda: {item.key: item.value for item in session.exec(select(SiteContent)).all()})
 
 @router.post("/", response_model=SiteContent)
 def create_or_update_content(content_item: SiteContent, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
@@ -22,11 +23,13 @@ def create_or_update_content(content_item: SiteContent, session: Session = Depen
         existing_item.value = content_item.value
         session.add(existing_item)
         session.commit()
+        bump("content")
         session.refresh(existing_item)
         return existing_item
     else:
         session.add(content_item)
         session.commit()
+        bump("content")
         session.refresh(content_item)
         return content_item
 
@@ -37,15 +40,16 @@ def delete_content(key: str, session: Session = Depends(get_session), current_us
         raise HTTPException(status_code=404, detail="Content key not found")
     session.delete(item)
     session.commit()
+    bump("content")
     return {"ok": True}
 
 # --- CMS Pages ---
 
-@router.get("/pages", response_model=List[Page])
-def read_pages(session: Session = Depends(get_session)):
-    return session.exec(select(Page)).all()
+@router.get("/pages", response_model=List[Page], dependencies=[cacheable("pages")])
+def read_pages(response: Response, session: Session = Depends(get_session)):
+    return read_cache.fetch(response, "pages", ("pages",), lambda: session.exec(select(Page)).all())
 
-@router.get("/pages/{slug}", response_model=Page)
+@router.get("/pages/{slug}", response_model=Page, dependencies=[cacheable("pages")])
 def read_page(slug: str, session: Session = Depends(get_session)):
     page = session.get(Page, slug)
     if not page:
@@ -59,6 +63,7 @@ def create_page(page: Page, session: Session = Depends(get_session), current_use
         raise HTTPException(status_code=400, detail="Page with this slug already exists")
     session.add(page)
     session.commit()
+    bump("pages", ids=[page.slug])
     session.refresh(page)
     return page
 
@@ -87,6 +92,7 @@ def update_page(slug: str, page_data: Page, session: Session = Depends(get_sessi
     
     session.add(page)
     session.commit()
+    bump("pages", ids=[page.slug])
     session.refresh(page)
     return page
 
@@ -97,4 +103,5 @@ def delete_page(slug: str, session: Session = Depends(get_session), current_user
         raise HTTPException(status_code=404, detail="Page not found")
     session.delete(page)
     session.commit()
+    bump("pages", ids=[slug])
     return {"ok": True}
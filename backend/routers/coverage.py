@@ -1,23 +1,42 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlmodel import Session, select
 from database import get_session
 from models import Region, City, AdminUser
 from auth import get_current_user
+from http_cache import cacheable, bump
+from read_cache import cache as read_cache
+from coverage_index import COVERAGE_COLLECTIONS, load_tree, store as coverage_index
 
 router = APIRouter(tags=["Market Coverage"])
 
+# --- Coverage tree & lookup ---
+
+@router.get("/coverage/tree", dependencies=[cacheable(*COVERAGE_COLLECTIONS)])
+def read_coverage_tree(response: Response, session: Session = Depends(get_session)):
+    """Regions with their cities nested, loaded in two queries."""
+    def load():
+        return [{**r.dict(), "cities": [c.dict() for c in sorted(r.cities, key=lambda c: c.id)]} for r in load_tree(session)]
+    return read_cache.fetch(response, "coverage/tree", COVERAGE_COLLECTIONS, load)
+
+@router.get("/coverage/lookup", dependencies=[cacheable(*COVERAGE_COLLECTIONS)])
+def lookup_coverage(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(10, ge=1, le=50), session: Session = Depends(get_session)):
+    """Cities and regions whose name starts with q (any word of it), in Arabic or
+    Latin script; "covered" is true when anything matched."""
+    results = coverage_index.get(session).lookup(q, limit)
+    return {"q": q, "covered": bool(results), "results": results}
+
 # --- Regions ---
 
-@router.get("/regions", response_model=List[Region])
-def read_regions(session: Session = Depends(get_session)):
-    regions = session.exec(select(Region)).all()
-    return regions
+@router.get("/regions", response_model=List[Region], dependencies=[cacheable("regions")])
+def read_regions(response: Response, session: Session = Depends(get_session)):
+    return read_cache.fetch(response, "regions", ("regions",), lambda: session.exec(select(Region)).all())
 
 @router.post("/regions", response_model=Region)
 def create_region(region: Region, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
     session.add(region)
     session.commit()
+    bump("regions")
     session.refresh(region)
     return region
 
@@ -28,22 +47,23 @@ def delete_region(region_id: int, session: Session = Depends(get_session), curre
         raise HTTPException(status_code=404, detail="Region not found")
     session.delete(region)
     session.commit()
+    bump("regions")
     return {"ok": True}
 
 # --- Cities ---
 
-@router.get("/cities", response_model=List[City])
-def read_cities(region_id: int = None, session: Session = Depends(get_session)):
+@router.get("/cities", response_model=List[City], dependencies=[cacheable("cities")])
+def read_cities(response: Response, region_id: int = None, session: Session = Depends(get_session)):
     query = select(City)
     if region_id:
         query = query.where(City.region_id == region_id)
-    cities = session.exec(query).all()
-    return cities
+    return read_cache.fetch(response, f"cities?region_id={region_id or ''}", ("cities",), lambda: session.exec(query).all())
 
 @router.post("/cities", response_model=City)
 def create_city(city: City, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
     session.add(city)
     session.commit()
+    bump("cities")
     session.refresh(city)
     return city
 
@@ -54,4 +74,5 @@ def delete_city(city_id: int, session: Session = Depends(get_session), current_u
         raise HTTPException(status_code=404, detail="City not found")
     session.delete(city)
     session.commit()
+    bump("cities")
     return {"ok": True}
@@ -1,9 +1,10 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from sqlmodel import Session
 from database import get_session
 from models import Inquiry, AdminUser
 from auth import get_current_user
+from fast_json import list_response
 
 router = APIRouter(prefix="/inquiries", tags=["Inquiries"])
 
@@ -16,8 +17,7 @@ def create_inquiry(inquiry: Inquiry, session: Session = Depends(get_session)):
 
 @router.get("/", response_model=List[Inquiry])
 def read_inquiries(session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
-    inquiries = session.exec(select(Inquiry).order_by(Inquiry.created_at.desc())).all()
-    return inquiries
+    return list_response(session, Inquiry, Inquiry.created_at.desc())
 
 @router.delete("/{inquiry_id}")
 def delete_inquiry(inquiry_id: int, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
@@ -1,54 +1,47 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
-from sqlmodel import Session, select
+from sqlmodel import Session
 from database import get_session
 from models import MediaAsset, AdminUser
 from auth import get_current_user
-import shutil
+from http_cache import cacheable, bump
+from fast_json import list_response
+from media_store import UPLOAD_DIR, receive_upload, save_upload, delete_file
 import os
-import uuid
 from datetime import datetime
 
 router = APIRouter(prefix="/media", tags=["Media Library"])
 
-UPLOAD_DIR = "static/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-@router.post("/upload", response_model=MediaAsset)
+# Documents the multipart body the handler parses itself
+UPLOAD_BODY = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file"], "properties": {"file": {"type": "string", "format": "binary"}},
+}}}}}
+
+@router.post("/upload", response_model=MediaAsset, openapi_extra=UPLOAD_BODY)
 async def upload_file(
-    file: UploadFile = File(...), 
+    request: Request,
+    response: Response,
     session: Session = Depends(get_session),
     current_user: AdminUser = Depends(get_current_user)
 ):
-    # Generate unique filename
-    file_ext = os.path.splitext(file.filename)[1]
-    filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    # Create DB entry
-    # URL construction: Assuming backend runs on port 8000
-    url = f"http://localhost:8000/static/uploads/{filename}"
-    
-    media_asset = MediaAsset(
-        filename=file.filename,
-        url=url,
-        file_type=file.content_type or "application/octet-stream"
-    )
-    
-    session.add(media_asset)
-    session.commit()
-    session.refresh(media_asset)
-    
+    # The file part goes straight from the request body to its temp file in
+    # UPLOAD_DIR, hashed on the way; storing it and looking up duplicates run
+    # off the event loop. An identical file returns the existing asset
+    # (MEDIA_MAX_UPLOAD_BYTES caps the size)
+    upload = await receive_upload(request)
+    media_asset, reused = await run_in_threadpool(save_upload, session, upload)
+    if not reused:
+        bump("media")
+    response.headers["X-Media-Deduplicated"] = "true" if reused else "false"
     return media_asset
 
-@router.get("/", response_model=List[MediaAsset])
-def read_media_assets(session: Session = Depends(get_session)):
-    return session.exec(select(MediaAsset).order_by(MediaAsset.uploaded_at.desc())).all()
+@router.get("/", response_model=List[MediaAsset], dependencies=[cacheable("media")])
+def read_media_assets(response: Response, session: Session = Depends(get_session)):
+    return list_response(session, MediaAsset, MediaAsset.uploaded_at.desc(), headers=response.headers)
 
 @router.delete("/{asset_id}")
 def delete_media_asset(asset_id: int, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
@@ -58,13 +51,11 @@ def delete_media_asset(asset_id: int, session: Session = Depends(get_session), c
     
     # Try to delete file from disk
     try:
-        filename = asset.url.split("/")[-1]
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        delete_file(session, asset)
     except Exception as e:
         print(f"Error deleting file: {e}")
         
     session.delete(asset)
     session.commit()
+    bump("media")
     return {"ok": True}
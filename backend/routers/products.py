@@ -1,23 +1,33 @@
+import os
+import tempfile
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlmodel import Session, select
 from database import get_session
 from models import Category, Product, AdminUser
 from auth import get_current_user
+from http_cache import cacheable, bump
+from read_cache import cache as read_cache
+import product_search
+import catalog_io
+from fast_json import as_dicts
 
 router = APIRouter(tags=["Products & Categories"])
 
 # --- Categories ---
 
-@router.get("/categories", response_model=List[Category])
-def read_categories(session: Session = Depends(get_session)):
-    categories = session.exec(select(Category)).all()
-    return categories
+@router.get("/categories", response_model=List[Category], dependencies=[cacheable("categories")])
+def read_categories(response: Response, session: Session = Depends(get_session)):
+    return read_cache.fetch(response, "categories", ("categories",), lambda: session.exec(select(Category)).all())
 
 @router.post("/categories", response_model=Category)
 def create_category(category: Category, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
     session.add(category)
     session.commit()
+    bump("categories", ids=[category.id])
     session.refresh(category)
     return category
 
@@ -33,6 +43,8 @@ def update_category(category_id: int, category_data: Category, session: Session
     
     session.add(category)
     session.commit()
+    bump("categories", ids=[category_id])
+    product_search.index_category(session, category_id)
     session.refresh(category)
     return category
 
@@ -43,26 +55,142 @@ def delete_category(category_id: int, session: Session = Depends(get_session), c
         raise HTTPException(status_code=404, detail="Category not found")
     session.delete(category)
     session.commit()
+    bump("categories", ids=[category_id])
+    product_search.index_category(session, category_id)
     return {"ok": True}
 
 # --- Products ---
 
-@router.get("/products", response_model=List[Product])
-def read_products(category_id: Optional[int] = None, session: Session = Depends(get_session)):
-    query = select(Product)
+PRODUCT_FIELDS = list(Product.__table__.columns.keys())
+
+@router.get("/products", response_model=List[Product], dependencies=[cacheable("products", "categories")])
+def read_products(
+    request: Request,
+    response: Response,
+    category_id: Optional[int] = None,
+    category: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    stock_status: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[int] = None,
+    count: bool = False,
+    session: Session = Depends(get_session),
+):
+    """Products ordered by id. With limit, X-Next-Cursor holds the cursor for the
+    next page (absent on the last one); count=true adds X-Total-Count for the
+    filters. fields=name,slug,image_url returns only those columns (plus id)."""
+    names = PRODUCT_FIELDS
+    if fields:
+        names = ["id"] + [f for f in dict.fromkeys(f.strip() for f in fields.split(",")) if f and f != "id"]
+        unknown = [f for f in names if f not in PRODUCT_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    conditions = []
     if category_id:
-        query = query.where(Product.category_id == category_id)
-    products = session.exec(query).all()
-    return products
+        conditions.append(Product.category_id == category_id)
+    if category:
+        conditions.append(Product.category_id == select(Category.id).where(Category.slug == category).scalar_subquery())
+    if is_active is not None:
+        conditions.append(Product.is_active == is_active)
+    if stock_status:
+        conditions.append(Product.stock_status == stock_status)
+    headers = {}
+
+    def load():
+        if count:
+            headers["X-Total-Count"] = str(session.exec(select(func.count(Product.id)).where(*conditions)).one())
+        # Plain columns, not Product instances: the list is read-only
+        query = select(*[getattr(Product, f) for f in names]).where(*conditions)
+        if cursor is not None:
+            query = query.where(Product.id > cursor)
+        query = query.order_by(Product.id)
+        if limit:
+            # One extra row tells us whether another page exists
+            query = query.limit(limit + 1)
+        rows = session.exec(query).all()
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = str(rows[-1].id)
+        return as_dicts(rows, names)
+
+    key = "products?" + "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    return read_cache.fetch(response, key, ("products", "categories"), load, headers)
+
+@router.get("/products/search", response_model=List[Product], dependencies=[cacheable("products", "categories")])
+def search_products(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=100), session: Session = Depends(get_session)):
+    """Full-text search over name, description, rich_description and category
+    name. Active products only, best match first; the last word may be partial."""
+    hits = product_search.search(session, q, limit)
+    if not hits:
+        return []
+    products = {p.id: p for p in session.exec(select(Product).where(Product.id.in_([pid for pid, _ in hits]))).all()}
+    return [products[pid] for pid, _ in hits if pid in products]
+
+# --- Bulk import / export ---
+
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(100 * 1024 * 1024)))
+# Uploads are spooled to disk past this size instead of held in memory
+BULK_SPOOL_BYTES = int(os.getenv("BULK_SPOOL_BYTES", str(8 * 1024 * 1024)))
+BULK_WRITE_BYTES = 1024 * 1024
+BULK_FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+def bulk_format(request: Request, format: Optional[str]) -> str:
+    if format:
+        if format not in BULK_FORMATS:
+            raise HTTPException(status_code=400, detail="format must be csv or jsonl")
+        return format
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return "jsonl"
+    raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass format=csv|jsonl")
+
+@router.post("/products/bulk")
+async def bulk_upsert_products(request: Request, format: Optional[str] = None, current_user: AdminUser = Depends(get_current_user)):
+    """Create or update products by slug from a CSV (header row) or JSONL body.
+    Columns match GET /products/export; category_slug links or creates a
+    category. Rows are committed in batches and bad rows are reported, not fatal."""
+    fmt = bulk_format(request, format)
+    with tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_BYTES) as spool:
+        size = 0
+        # Past BULK_SPOOL_BYTES the spool is a disk file, so writes go through
+        # the threadpool, a megabyte at a time
+        pending = bytearray()
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > BULK_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {BULK_MAX_BYTES} bytes")
+            pending += chunk
+            if len(pending) >= BULK_WRITE_BYTES:
+                await run_in_threadpool(spool.write, bytes(pending))
+                pending.clear()
+        if pending:
+            await run_in_threadpool(spool.write, bytes(pending))
+        await run_in_threadpool(spool.seek, 0)
+        report = await run_in_threadpool(catalog_io.import_products, spool, fmt)
+    if report.created or report.updated:
+        bump(*(("products", "categories") if report.categories_created else ("products",)))
+    return report.to_dict()
+
+@router.get("/products/export")
+def export_products(request: Request, format: str = "csv", current_user: AdminUser = Depends(get_current_user)):
+    fmt = bulk_format(request, format)
+    return StreamingResponse(
+        catalog_io.export_products(fmt),
+        media_type=BULK_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="products.{fmt}"'},
+    )
 
-@router.get("/products/{product_id}", response_model=Product)
+@router.get("/products/{product_id}", response_model=Product, dependencies=[cacheable("products")])
 def read_product(product_id: int, session: Session = Depends(get_session)):
     product = session.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
-@router.get("/products/slug/{slug}", response_model=Product)
+@router.get("/products/slug/{slug}", response_model=Product, dependencies=[cacheable("products")])
 def read_product_by_slug(slug: str, session: Session = Depends(get_session)):
     product = session.exec(select(Product).where(Product.slug == slug)).first()
     if not product:
@@ -73,6 +201,8 @@ def read_product_by_slug(slug: str, session: Session = Depends(get_session)):
 def create_product(product: Product, session: Session = Depends(get_session), current_user: AdminUser = Depends(get_current_user)):
     session.add(product)
     session.commit()
+    bump("products", ids=[product.id])
+    product_search.index_products(session, [product.id])
     session.refresh(product)
     return product
 
@@ -88,6 +218,8 @@ def update_product(product_id: int, product_data: Product, session: Session = De
         
     session.add(product)
     session.commit()
+    bump("products", ids=[product_id])
+    product_search.index_products(session, [product_id])
     session.refresh(product)
     return product
 
@@ -98,4 +230,6 @@ def delete_product(product_id: int, session: Session = Depends(get_session), cur
         raise HTTPException(status_code=404, detail="Product not found")
     session.delete(product)
     session.commit()
+    bump("products", ids=[product_id])
+    product_search.index_products(session, [product_id])
     return {"ok": True}
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends, Response
+from sqlmodel import Session
+from database import get_session
+from http_cache import cacheable
+from home_snapshot import snapshot as home_snapshot, HOME_COLLECTIONS
+
+router = APIRouter(prefix="/snapshot", tags=["Snapshot"])
+
+@router.get("/home", dependencies=[cacheable(*HOME_COLLECTIONS)])
+def read_home_snapshot(response: Response, session: Session = Depends(get_session)):
+    """Content, active banners, categories with product counts, featured products
+    and regions with cities, in one pre-serialized response."""
+    return Response(content=home_snapshot.get(session), media_type="application/json", headers=dict(response.headers))
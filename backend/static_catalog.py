@@ -0,0 +1,295 @@
+import os
+import re
+import json
+import gzip
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+from starlette.exceptions import HTTPException
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+from database import engine
+from models import SiteContent, Page, Category, Product, Region
+from http_cache import versions
+from read_cache import render
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Publishes the public catalog as JSON files under /static so most reads never
+# reach Python. Each file name carries a hash of its content and is written
+# next to .gz (and .br when brotli is installed) copies; manifest.json maps
+# logical names such as "categories" or "products/<slug>" to the current
+# URLs. Version bumps are queued and published by a background thread: only
+# the groups that read the bumped collections are rebuilt, per-row files only
+# for the rows the bump names, and only files whose content changed are written.
+
+STATIC_CATALOG_ENABLED = os.getenv("STATIC_CATALOG_ENABLED", "1") == "1"
+STATIC_CATALOG_DIR = os.getenv("STATIC_CATALOG_DIR", "static/catalog")
+STATIC_CATALOG_URL = os.getenv("STATIC_CATALOG_URL", "/static/catalog")
+# Replaced files stay this long for clients still holding an older manifest
+STATIC_CATALOG_KEEP_SECONDS = int(os.getenv("STATIC_CATALOG_KEEP_SECONDS", "3600"))
+
+MANIFEST = "manifest.json"
+HASHED_FILE = re.compile(r"\.[0-9a-f]{16}\.json$")
+
+PRODUCT_CARD = ("id", "name", "slug", "description", "image_url", "category_id", "stock_status")
+CATEGORY_REF = ("id", "name", "slug", "packing_options")
+
+# Builders take the touched row keys per bumped collection, or None to build
+# everything, and return ({logical name: payload}, {per-row name: row key},
+# the row keys whose files were rebuilt or None when all of them were).
+Built = Tuple[dict, dict, Optional[set]]
+
+def _content(session: Session, touched: Optional[dict] = None) -> Built:
+    return {"content": {c.key: c.value for c in session.exec(select(SiteContent)).all()}}, {}, None
+
+def _pages(session: Session, touched: Optional[dict] = None) -> Built:
+    slugs = touched.get("pages") if touched is not None else None
+    pages = session.exec(select(Page).where(Page.is_published == True).order_by(Page.slug)).all()
+    files, keys = {"pages": pages}, {}
+    for p in pages:
+        if slugs is None or p.slug in slugs:
+            files[f"pages/{p.slug}"] = p
+            keys[f"pages/{p.slug}"] = p.slug
+    return files, keys, slugs
+
+def _categories(session: Session, touched: Optional[dict] = None) -> Built:
+    counts = dict(session.exec(
+        select(Product.category_id, func.count(Product.id)).where(Product.is_active == True).group_by(Product.category_id)
+    ).all())
+    categories = session.exec(select(Category).order_by(Category.display_order, Category.id)).all()
+    return {"categories": [{**c.dict(), "product_count": counts.get(c.id, 0)} for c in categories]}, {}, None
+
+def _products(session: Session, touched: Optional[dict] = None) -> Built:
+    cards = session.exec(
+        select(*[getattr(Product, f) for f in PRODUCT_CARD]).where(Product.is_active == True).order_by(Product.id)
+    ).all()
+    files = {"products": [dict(zip(PRODUCT_CARD, row)) for row in cards]}
+    query = select(Product).where(Product.is_active == True)
+    ids = None
+    if touched is not None:
+        # The rows named by the bump, plus those embedding a touched category
+        ids = set(touched.get("products") or ())
+        if touched.get("categories"):
+            ids |= set(session.exec(select(Product.id).where(Product.category_id.in_(touched["categories"]))).all())
+        query = query.where(Product.id.in_(ids))
+    products = session.exec(query.order_by(Product.id)).all()
+    categories = {
+        c.id: {f: getattr(c, f) for f in CATEGORY_REF}
+        for c in session.exec(select(Category).where(Category.id.in_({p.category_id for p in products}))).all()
+    }
+    keys = {}
+    for p in products:
+        files[f"products/{p.slug}"] = {**p.dict(), "category": categories.get(p.category_id)}
+        keys[f"products/{p.slug}"] = p.id
+    return files, keys, ids
+
+def _regions(session: Session, touched: Optional[dict] = None) -> Built:
+    regions = session.exec(select(Region).options(selectinload(Region.cities)).order_by(Region.id)).all()
+    return {"regions": [{**r.dict(), "cities": [c.dict() for c in sorted(r.cities, key=lambda c: c.id)]} for r in regions]}, {}, None
+
+# group -> (collections it is built from, builder)
+GROUPS: Dict[str, Tuple[Tuple[str, ...], Callable[[Session, Optional[dict]], Built]]] = {
+    "content": (("content",), _content),
+    "pages": (("pages",), _pages),
+    "categories": (("categories", "products"), _categories),
+    "products": (("products", "categories"), _products),
+    "regions": (("regions", "cities"), _regions),
+}
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+class CatalogPublisher:
+    def __init__(self, base_dir: str = STATIC_CATALOG_DIR, base_url: str = STATIC_CATALOG_URL):
+        self.base_dir = base_dir
+        self.base_url = base_url.rstrip("/")
+        self._lock = threading.Lock()
+        # collection -> touched row keys, or None for the whole collection
+        self._pending: Dict[str, Optional[Set]] = {}
+        self._wake = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+
+    @contextmanager
+    def _exclusive(self):
+        # Workers on the same host publish one at a time so manifests don't race
+        os.makedirs(self.base_dir, exist_ok=True)
+        with self._lock, open(os.path.join(self.base_dir, ".lock"), "w") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.base_dir, MANIFEST)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"version": None, "generated_at": None, "files": {}}
+
+    def _store(self, name: str, body: bytes, digest: str) -> str:
+        relative = re.sub(r"[^\w/-]", "_", name) + f".{digest}.json"
+        path = os.path.join(self.base_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path + ".gz", gzip.compress(body, 9, mtime=0))
+        if brotli:
+            _write_atomic(path + ".br", brotli.compress(body))
+        # Plain file last: it is what the manifest points at
+        _write_atomic(path, body)
+        return relative
+
+    def schedule(self, names: Iterable[str], ids: Optional[Iterable] = None) -> None:
+        """Queue a publish for these collections without waiting for it; ids
+        limits per-row files to those rows."""
+        with self._wake:
+            for name in names:
+                if ids is None or (name in self._pending and self._pending[name] is None):
+                    self._pending[name] = None
+                else:
+                    self._pending.setdefault(name, set()).update(ids)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._drain, name="static-catalog", daemon=True)
+                self._worker.start()
+            self._wake.notify()
+
+    def _drain(self) -> None:
+        while True:
+            with self._wake:
+                while not self._pending:
+                    self._wake.wait()
+                pending, self._pending = self._pending, {}
+            try:
+                self.publish(*pending, touched=pending)
+            except Exception as e:
+                # The API still serves everything; a later bump or POST /cache/publish catches up
+                print(f"Static catalog publish failed: {e}")
+
+    def publish(self, *names: str, touched: Optional[Dict[str, Optional[Set]]] = None) -> dict:
+        """Rebuild the groups reading any of these collections (all of them when
+        none are given) and write the files whose content changed. touched maps
+        a collection to the row keys that changed (None: all of them)."""
+        groups = [g for g, (deps, _) in GROUPS.items() if not names or set(deps) & set(names)]
+        written = removed = 0
+        if not groups:
+            return {"groups": groups, "written": written, "removed": removed}
+        with self._exclusive(), Session(engine) as session:
+            manifest = self.manifest()
+            files = manifest["files"]
+            for group in groups:
+                deps, build = GROUPS[group]
+                scope = None
+                # A first publish has nothing to patch
+                if touched is not None and manifest["version"] is not None:
+                    bumped = [d for d in deps if d in touched]
+                    if all(touched[d] is not None for d in bumped):
+                        scope = {d: touched[d] for d in bumped}
+                payloads, keys, rebuilt = build(session, scope)
+                for name in [
+                    n for n, entry in files.items()
+                    if entry["group"] == group and n not in payloads and (rebuilt is None or entry.get("key") in rebuilt)
+                ]:
+                    del files[name]
+                    removed += 1
+                for name, payload in payloads.items():
+                    body = render(payload)
+                    digest = hashlib.sha256(body).hexdigest()[:16]
+                    entry = files.get(name)
+                    if entry and entry["hash"] == digest and os.path.exists(os.path.join(self.base_dir, entry["file"])):
+                        if name in keys:
+                            entry["key"] = keys[name]
+                        continue
+                    relative = self._store(name, body, digest)
+                    files[name] = {"url": f"{self.base_url}/{relative}", "file": relative, "hash": digest, "bytes": len(body), "group": group}
+                    if name in keys:
+                        files[name]["key"] = keys[name]
+                    written += 1
+            if written or removed or manifest["version"] is None:
+                manifest["version"] = hashlib.sha256(
+                    "".join(f"{n}={e['hash']}" for n, e in sorted(files.items())).encode("utf-8")
+                ).hexdigest()[:16]
+                manifest["generated_at"] = datetime.utcnow().isoformat() + "Z"
+                body = json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                _write_atomic(os.path.join(self.base_dir, MANIFEST + ".gz"), gzip.compress(body, 9, mtime=0))
+                _write_atomic(os.path.join(self.base_dir, MANIFEST), body)
+                self._prune({e["file"] for e in files.values()})
+        return {"groups": groups, "written": written, "removed": removed, "files": len(files), "version": manifest["version"]}
+
+    def _prune(self, current: set) -> None:
+        cutoff = time.time() - STATIC_CATALOG_KEEP_SECONDS
+        for root, _, filenames in os.walk(self.base_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                relative = os.path.relpath(path, self.base_dir).replace(os.sep, "/")
+                base = re.sub(r"\.(gz|br)$", "", relative)
+                if not HASHED_FILE.search(base) or base in current:
+                    continue
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+publisher = CatalogPublisher()
+
+def on_bump(*names: str, ids: Optional[Iterable] = None) -> None:
+    # Writes only queue the publish; the request never waits on rendering
+    if STATIC_CATALOG_ENABLED:
+        publisher.schedule(names, ids)
+
+versions.listeners.append(on_bump)
+
+def _accepted(scope) -> set:
+    for key, value in scope.get("headers", []):
+        if key == b"accept-encoding":
+            return {
+                part.split(";")[0].strip() for part in value.decode("latin-1").lower().split(",")
+                if not part.replace(" ", "").endswith(";q=0")
+            }
+    return set()
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves a published file's .br or .gz copy when the client
+    accepts it, and marks content-hashed catalog files immutable."""
+
+    def __init__(self, *args, catalog_prefix: str = "catalog/", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.catalog_prefix = catalog_prefix
+
+    async def get_response(self, path: str, scope):
+        if not path.replace(os.sep, "/").startswith(self.catalog_prefix) or not path.endswith(".json"):
+            return await super().get_response(path, scope)
+        accepted = _accepted(scope)
+        response = None
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding in accepted:
+                try:
+                    response = await super().get_response(path + suffix, scope)
+                except HTTPException:
+                    # No copy in this encoding (.br needs brotli at publish time)
+                    continue
+                response.headers["Content-Encoding"] = encoding
+                response.headers["Content-Type"] = "application/json"
+                break
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers["Vary"] = "Accept-Encoding"
+        if HASHED_FILE.search(path):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
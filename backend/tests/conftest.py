@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# Modules read their settings at import time, so point every on-disk path at a
+# scratch directory before anything from the backend is imported
+_tmp = tempfile.mkdtemp(prefix="te-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_tmp, 'test.db')}",
+    "LLM_PROVIDER": "fake",
+    "CHAT_RETENTION_INTERVAL_HOURS": "0",
+    "CHAT_RETENTION_LOCK": os.path.join(_tmp, "chat_retention.lock"),
+    "CHAT_ARCHIVE_DIR": os.path.join(_tmp, "chat_archive"),
+    "VERSION_DIR": os.path.join(_tmp, "versions"),
+    "STATIC_CATALOG_DIR": os.path.join(_tmp, "catalog"),
+    "ANN_INDEX_DIR": os.path.join(_tmp, "ann"),
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
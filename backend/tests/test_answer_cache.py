@@ -0,0 +1,42 @@
+import pytest
+from fastapi.testclient import TestClient
+import llm
+import main
+from answer_cache import cache as answer_cache
+from auth import get_current_user
+from context_snapshot import store as context_snapshot
+from http_cache import VersionStore, VERSION_DIR
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(llm.provider, "generate", lambda prompt: "Delivery takes two weeks.")
+    main.app.dependency_overrides[get_current_user] = lambda: None
+    with TestClient(main.app) as c:
+        c.post("/chatbot/knowledge", json={"question": "delivery time", "answer": "two weeks"})
+        yield c
+    main.app.dependency_overrides.clear()
+
+def other_worker_writes(*names):
+    # A separate store has none of this process's listeners, like another worker
+    VersionStore(VERSION_DIR).bump(*names)
+
+@pytest.mark.parametrize("collection", ["content", "products", "knowledge"])
+def test_write_on_another_worker_retires_cached_answer(client, collection):
+    ask = {"message": "what is the delivery time"}
+    client.post("/chatbot/ask", json=ask)
+    hits = answer_cache.exact_hits
+    client.post("/chatbot/ask", json=ask)
+    assert answer_cache.exact_hits == hits + 1
+
+    other_worker_writes(collection)
+    client.post("/chatbot/ask", json=ask)
+    assert answer_cache.exact_hits == hits + 1
+
+def test_context_snapshot_follows_shared_stamps(client):
+    from sqlmodel import Session
+    from database import engine
+    with Session(engine) as session:
+        first = context_snapshot.get(session)
+        assert context_snapshot.get(session) is first
+        other_worker_writes("content")
+        assert context_snapshot.get(session) is not first
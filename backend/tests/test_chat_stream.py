@@ -0,0 +1,33 @@
+import pytest
+from fastapi.testclient import TestClient
+import main
+from routers import chatbot
+
+def events(body: str):
+    return [block.split("\n")[0].removeprefix("event: ") for block in body.strip().split("\n\n")]
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as c:
+        yield c
+
+def test_stream_ends_with_done(client):
+    r = client.post("/chatbot/ask/stream", json={"message": "hello"})
+    assert events(r.text)[-1] == "done"
+
+def test_failure_before_streaming_ends_with_error_event(client, monkeypatch):
+    def broken(session, request):
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(chatbot, "prepare_answer", broken)
+    r = client.post("/chatbot/ask/stream", json={"message": "hello"})
+    assert r.status_code == 200
+    assert events(r.text) == ["error"]
+
+def test_failure_after_tokens_ends_with_error_event(client, monkeypatch):
+    monkeypatch.setattr(chatbot, "prepare_answer", lambda session, request: {"sid": "s", "sources": [], "prompt": "p"})
+    monkeypatch.setattr(chatbot.llm, "generate_stream", lambda prompt: iter(["partial "]))
+    def broken(session, plan, ans):
+        raise RuntimeError("could not save the reply")
+    monkeypatch.setattr(chatbot, "complete_answer", broken)
+    r = client.post("/chatbot/ask/stream", json={"message": "hello"})
+    assert events(r.text) == ["meta", "token", "error"]
@@ -0,0 +1,29 @@
+import pytest
+from fastapi.testclient import TestClient
+import fast_json
+import main
+from auth import get_current_user
+
+@pytest.fixture
+def client():
+    main.app.dependency_overrides[get_current_user] = lambda: None
+    with TestClient(main.app) as c:
+        yield c
+    main.app.dependency_overrides.clear()
+
+def test_fast_path_is_opt_in():
+    assert fast_json.FAST_JSON_ENABLED is False
+
+@pytest.mark.parametrize("path", ["/inquiries/", "/chatbot/knowledge", "/media/"])
+def test_list_endpoints_honor_the_flag(client, monkeypatch, path):
+    client.post("/inquiries/", json={"name": "Ali", "email": "ali@example.com", "message": "Bulk wax price?", "inquiry_type": "Quote"})
+    client.post("/chatbot/knowledge", json={"question": "payment terms", "answer": "30 days"})
+    calls = []
+    monkeypatch.setattr(fast_json, "list_rows", lambda *a, **k: calls.append(a) or [])
+    client.get(path)
+    assert calls == []
+
+    monkeypatch.undo()
+    standard = client.get(path).json()
+    monkeypatch.setattr(fast_json, "FAST_JSON_ENABLED", True)
+    assert client.get(path).json() == standard
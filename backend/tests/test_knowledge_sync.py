@@ -0,0 +1,43 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from database import engine
+import indexer
+import llm
+import main
+from auth import get_current_user
+from vector_index import index as vector_index
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(indexer, "EMBED_MAX_RETRIES", 0)
+    main.app.dependency_overrides[get_current_user] = lambda: None
+    with TestClient(main.app) as c:
+        yield c
+    main.app.dependency_overrides.clear()
+
+def test_failed_embedding_is_retried_by_a_background_reindex(client, monkeypatch):
+    embed = llm.provider.embed_texts
+    calls = []
+
+    def flaky(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            raise RuntimeError("embedding service unavailable")
+        return embed(texts)
+
+    monkeypatch.setattr(llm.provider, "embed_texts", flaky)
+    r = client.post("/chatbot/knowledge", json={"question": "warranty period", "answer": "one year"})
+    assert r.status_code == 202
+    item_id = r.json()["id"]
+    job = client.get(f"/chatbot/reindex/{r.headers['X-Reindex-Job']}").json()
+    assert job["status"] in ("completed", "completed_with_errors")
+    with Session(engine) as session:
+        vector_index.ensure_fresh(session)
+    snap = vector_index._snapshot
+    assert str(item_id) in snap.source_ids[snap.rows_of(["knowledge"])].tolist()
+
+def test_successful_write_is_200_without_job(client):
+    r = client.post("/chatbot/knowledge", json={"question": "office hours", "answer": "9 to 5"})
+    assert r.status_code == 200
+    assert "X-Reindex-Job" not in r.headers
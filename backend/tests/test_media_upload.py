@@ -0,0 +1,42 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+import main
+import media_store
+import starlette.formparsers
+from auth import get_current_user
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_store, "UPLOAD_DIR", str(tmp_path))
+    main.app.dependency_overrides[get_current_user] = lambda: None
+    with TestClient(main.app) as c:
+        yield c
+    main.app.dependency_overrides.clear()
+
+def test_upload_is_written_once_into_the_upload_dir(client, tmp_path, monkeypatch):
+    spooled = []
+    real = starlette.formparsers.SpooledTemporaryFile
+    monkeypatch.setattr(starlette.formparsers, "SpooledTemporaryFile", lambda *a, **k: spooled.append(1) or real(*a, **k))
+    body = os.urandom(3 * media_store.MEDIA_CHUNK_BYTES + 5)
+    r = client.post("/media/upload", data={"note": "x"}, files={"file": ("Drum.PNG", body, "image/png")})
+    assert r.status_code == 200, r.text
+    asset = r.json()
+    assert spooled == []
+    assert asset["filename"] == "Drum.PNG" and asset["file_type"] == "image/png" and asset["size"] == len(body)
+    [stored] = os.listdir(tmp_path)
+    assert stored.endswith(".png") and asset["url"].endswith(stored)
+    assert (tmp_path / stored).read_bytes() == body
+
+    again = client.post("/media/upload", files={"file": ("copy.png", body, "image/png")})
+    assert again.headers["X-Media-Deduplicated"] == "true" and again.json()["id"] == asset["id"]
+    assert os.listdir(tmp_path) == [stored]
+
+def test_oversized_upload_leaves_no_temp_file(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(media_store, "MEDIA_MAX_UPLOAD_BYTES", 10)
+    r = client.post("/media/upload", files={"file": ("big.bin", b"x" * 11, "application/octet-stream")})
+    assert r.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+def test_upload_without_file_part(client):
+    assert client.post("/media/upload", data={"file": "not a file"}).status_code == 422
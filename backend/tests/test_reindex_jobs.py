@@ -0,0 +1,64 @@
+import os
+import sys
+import subprocess
+import time
+from datetime import datetime, timedelta
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, delete, select
+from database import DATABASE_URL, engine
+from models import ReindexJobRecord
+import indexer
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(autouse=True)
+def empty_jobs():
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.exec(delete(ReindexJobRecord))
+        session.commit()
+    indexer._jobs.clear()
+    yield
+
+def test_job_claimed_through_another_engine_is_reused():
+    other = create_engine(DATABASE_URL)
+    with Session(other) as session:
+        session.add(ReindexJobRecord(id="elsewhere", status="running", active="reindex"))
+        session.commit()
+    job, created = indexer.start_job()
+    assert not created and job.id == "elsewhere"
+
+def test_stale_claim_is_failed_and_replaced():
+    other = create_engine(DATABASE_URL)
+    with Session(other) as session:
+        session.add(ReindexJobRecord(id="dead", status="running", active="reindex", updated_at=datetime.utcnow() - timedelta(days=1)))
+        session.commit()
+    job, created = indexer.start_job()
+    assert created and job.id != "dead"
+    with Session(other) as session:
+        dead = session.get(ReindexJobRecord, "dead")
+        assert dead.status == "failed" and dead.active is None
+        assert [r.id for r in session.exec(select(ReindexJobRecord).where(ReindexJobRecord.active == "reindex"))] == [job.id]
+
+def test_finished_job_releases_claim():
+    job, created = indexer.start_job()
+    job.status = "completed"
+    job.save()
+    second, created = indexer.start_job()
+    assert created and second.id != job.id
+
+def test_workers_starting_at_once_share_one_job():
+    # Separate processes, each with its own engine, released at the same moment
+    start_at = time.time() + 1.5
+    code = (
+        "import time, indexer\n"
+        f"time.sleep(max(0, {start_at} - time.time()))\n"
+        "job, created = indexer.start_job()\n"
+        "print(job.id, created)\n"
+    )
+    env = {**os.environ, "PYTHONPATH": BACKEND}
+    procs = [subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True, env=env, cwd=BACKEND) for _ in range(4)]
+    results = [p.communicate(timeout=60)[0].split() for p in procs]
+    assert all(p.returncode == 0 for p in procs)
+    assert len({job_id for job_id, _ in results}) == 1
+    assert [created for _, created in results].count("True") == 1
@@ -0,0 +1,35 @@
+import gzip
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from static_catalog import PrecompressedStaticFiles
+
+def _client(tmp_path):
+    catalog = tmp_path / "catalog"
+    catalog.mkdir()
+    body = b'{"version":"1","files":{}}'
+    (catalog / "manifest.json").write_bytes(body)
+    (catalog / "manifest.json.gz").write_bytes(gzip.compress(body))
+    (catalog / "products.0123456789abcdef.json").write_bytes(b"[]")
+    app = FastAPI()
+    app.mount("/static", PrecompressedStaticFiles(directory=str(tmp_path)), name="static")
+    return TestClient(app)
+
+def test_browser_accept_encoding_without_br_copy_falls_back_to_gzip(tmp_path):
+    client = _client(tmp_path)
+    r = client.get("/static/catalog/manifest.json", headers={"Accept-Encoding": "gzip, deflate, br"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.json() == {"version": "1", "files": {}}
+    assert r.headers["cache-control"] == "no-cache"
+
+def test_br_only_client_gets_identity_copy(tmp_path):
+    client = _client(tmp_path)
+    r = client.get("/static/catalog/products.0123456789abcdef.json", headers={"Accept-Encoding": "br"})
+    assert r.status_code == 200
+    assert "content-encoding" not in r.headers
+    assert r.headers["cache-control"] == "public, max-age=31536000, immutable"
+
+def test_missing_file_is_still_404(tmp_path):
+    client = _client(tmp_path)
+    r = client.get("/static/catalog/nope.json", headers={"Accept-Encoding": "gzip, deflate, br"})
+    assert r.status_code == 404
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from sqlmodel import Session, SQLModel, delete
+from database import engine
+from models import ChunkEmbedding, EmbeddingDocument
+import vector_index
+from vector_index import VectorIndex, corpus_stamp, encode_vector
+
+DIM = 16
+
+def _vector(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+
+def _put(session: Session, doc_id: int, seed: int, when: datetime):
+    h = f"h{doc_id}-{seed}"
+    blob, dim, norm = encode_vector(_vector(seed))
+    session.merge(ChunkEmbedding(content_hash=h, embedding=blob, dim=dim, norm=norm))
+    doc = session.get(EmbeddingDocument, doc_id) or EmbeddingDocument(id=doc_id, source_type="product", source_id=str(doc_id))
+    doc.text, doc.content_hash, doc.updated_at = f"text {doc_id} {seed}", h, when
+    session.add(doc)
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, "ANN_MIN_ROWS", 50)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.exec(delete(EmbeddingDocument))
+        session.exec(delete(ChunkEmbedding))
+        t0 = datetime(2026, 1, 1)
+        for i in range(1, 201):
+            _put(session, i, i, t0)
+        session.commit()
+        index = VectorIndex()
+        index.load(session)
+        index.publish(str(tmp_path))
+        yield session, index, str(tmp_path)
+
+def test_refresh_patches_published_version(corpus):
+    session, index, base_dir = corpus
+    assert index._snapshot.ivf is not None
+    later = datetime(2026, 1, 2)
+    _put(session, 5, 1005, later)
+    _put(session, 201, 1201, later)
+    session.delete(session.get(EmbeddingDocument, 7))
+    session.commit()
+
+    index.refresh(session, base_dir)
+    snap = index._snapshot
+    assert snap.stamp == corpus_stamp(session)
+    assert snap.ivf is not None and isinstance(snap.matrix, np.memmap)
+    assert sorted(snap.doc_ids.tolist()) == [i for i in range(1, 202) if i != 7]
+    for doc_id, seed in ((5, 1005), (201, 1201), (9, 9)):
+        hit = index.search(_vector(seed), k=1)[0]
+        assert hit["doc_id"] == doc_id and hit["text"] == f"text {doc_id} {seed}"
+
+    # Another worker maps the same version instead of reading the table
+    other = VectorIndex()
+    assert other.load_published(corpus_stamp(session), base_dir)
+    assert other.search(_vector(1201), k=1)[0]["doc_id"] == 201
+
+def test_refresh_without_changes_keeps_version(corpus):
+    session, index, base_dir = corpus
+    before = index._snapshot
+    index.refresh(session, base_dir)
+    assert index._snapshot.stamp == before.stamp
+    assert len(index._snapshot) == 200
@@ -0,0 +1,322 @@
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+from models import EmbeddingDocument, ChunkEmbedding
+import ann_index
+
+# Process-wide in-memory copy of embedding_documents.
+# All vectors live in one pre-normalized float32 matrix, with metadata kept in
+# parallel arrays so a query is a single matrix-vector product.
+# A reindex publishes the matrix to ANN_INDEX_DIR and workers memory-map it;
+# above ANN_MIN_ROWS an IVF index limits scoring to the closest clusters.
+# Smaller writes patch the published version with the rows they changed.
+
+ANN_INDEX_DIR = os.getenv("ANN_INDEX_DIR", "data/ann_index")
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "5000"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+
+def corpus_stamp(session: Session) -> tuple:
+    row = session.exec(
+        select(func.count(EmbeddingDocument.id), func.max(EmbeddingDocument.id), func.max(EmbeddingDocument.updated_at))
+    ).one()
+    # Strings so the stamp survives a round trip through meta.json
+    return tuple(str(x) for x in row)
+
+class _Snapshot:
+    def __init__(self, matrix: np.ndarray, doc_ids: np.ndarray, source_types: np.ndarray, source_ids: np.ndarray, texts: Sequence[str], versions: np.ndarray, stamp: tuple, ivf: Optional[ann_index.IVFIndex] = None):
+        self.matrix = matrix
+        self.doc_ids = doc_ids
+        self.source_types = source_types
+        self.source_ids = source_ids
+        self.texts = texts
+        # updated_at of each row in microseconds, to find the rows a refresh must re-read
+        self.versions = versions
+        self.stamp = stamp
+        self.ivf = ivf
+        # Row numbers of each source_type, so a filtered search scores only its rows
+        self.type_rows: Dict[str, np.ndarray] = {
+            t: np.flatnonzero(source_types == t) for t in set(source_types.tolist())
+        }
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def rows_of(self, source_types: Sequence[str]) -> np.ndarray:
+        parts = [self.type_rows[t] for t in source_types if t in self.type_rows]
+        return np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+
+    def take(self, rows: np.ndarray, ivf: Optional[ann_index.IVFIndex] = None) -> "_Snapshot":
+        return _Snapshot(
+            matrix=self.matrix[rows], doc_ids=self.doc_ids[rows], source_types=self.source_types[rows],
+            source_ids=self.source_ids[rows], texts=[self.texts[i] for i in rows], versions=self.versions[rows],
+            stamp=self.stamp, ivf=ivf,
+        )
+
+VECTOR_DTYPE = np.dtype("<f4")
+EPOCH = datetime(1970, 1, 1)
+FETCH_BATCH = 500
+
+def encode_vector(vec: Sequence[float]) -> Tuple[bytes, int, float]:
+    v = np.asarray(vec, dtype=VECTOR_DTYPE)
+    return v.tobytes(), int(v.shape[0]), float(np.linalg.norm(v))
+
+def decode_vector(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=VECTOR_DTYPE)
+
+def row_version(updated_at: Optional[datetime]) -> int:
+    return (updated_at - EPOCH) // timedelta(microseconds=1) if updated_at is not None else 0
+
+def _normalize(vec: Sequence[float]) -> Optional[np.ndarray]:
+    v = np.asarray(vec, dtype=np.float32)
+    n = float(np.linalg.norm(v))
+    if n == 0:
+        return None
+    return v / n
+
+def _fetch(session: Session, ids: Optional[List[int]] = None, dim: Optional[int] = None) -> Tuple[list, np.ndarray]:
+    """(doc_id, source_type, source_id, text, version) and unit vectors of the
+    rows with a vector of the corpus dimension; every row when ids is None."""
+    query = (
+        select(
+            EmbeddingDocument.id, EmbeddingDocument.source_type, EmbeddingDocument.source_id, EmbeddingDocument.text,
+            EmbeddingDocument.updated_at, ChunkEmbedding.embedding, ChunkEmbedding.dim, ChunkEmbedding.norm,
+            EmbeddingDocument.embedding, EmbeddingDocument.dim, EmbeddingDocument.norm, EmbeddingDocument.embedding_json,
+        )
+        .outerjoin(ChunkEmbedding, ChunkEmbedding.content_hash == EmbeddingDocument.content_hash)
+        .order_by(EmbeddingDocument.id)
+    )
+    if ids is None:
+        rows = session.exec(query).all()
+    else:
+        rows = [r for i in range(0, len(ids), FETCH_BATCH) for r in session.exec(query.where(EmbeddingDocument.id.in_(ids[i:i + FETCH_BATCH]))).all()]
+    kept, blobs, norms = [], [], []
+    for doc_id, source_type, source_id, text, updated_at, blob, d, norm, row_blob, row_d, row_norm, emb_json in rows:
+        if blob is None:
+            # Per-row vectors not yet moved to chunk_embeddings by migrate_embeddings.py
+            blob, d, norm = row_blob, row_d, row_norm
+        if blob is None:
+            if not emb_json:
+                continue
+            # Rows not yet converted by migrate_embeddings.py
+            blob, d, norm = encode_vector(json.loads(emb_json))
+        elif d is None:
+            d = len(blob) // VECTOR_DTYPE.itemsize
+        if dim is None:
+            dim = d
+        if d != dim:
+            continue
+        if norm is None:
+            norm = float(np.linalg.norm(decode_vector(blob)))
+        kept.append((doc_id, source_type, source_id, text, row_version(updated_at)))
+        blobs.append(blob)
+        norms.append(norm)
+    if not blobs:
+        return kept, np.zeros((0, dim or 0), dtype=np.float32)
+    matrix = decode_vector(b"".join(blobs)).reshape(len(blobs), dim)
+    norms_arr = np.asarray(norms, dtype=np.float32)
+    norms_arr[norms_arr == 0] = 1.0
+    return kept, matrix / norms_arr[:, None]
+
+def _snapshot(kept: list, matrix: np.ndarray, stamp: tuple) -> _Snapshot:
+    return _Snapshot(
+        matrix=matrix,
+        doc_ids=np.array([r[0] for r in kept], dtype=np.int64),
+        source_types=np.array([r[1] for r in kept], dtype=object),
+        source_ids=np.array([r[2] for r in kept], dtype=object),
+        texts=np.array([r[3] for r in kept], dtype=object),
+        versions=np.array([r[4] for r in kept], dtype=np.int64),
+        stamp=stamp,
+    )
+
+class VectorIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+
+    def _stamp(self, session: Session) -> tuple:
+        return corpus_stamp(session)
+
+    def _install(self, snap: _Snapshot) -> None:
+        with self._lock:
+            self._snapshot = snap
+
+    def load(self, session: Session) -> None:
+        stamp = self._stamp(session)
+        kept, matrix = _fetch(session)
+        self._install(_snapshot(kept, matrix, stamp))
+
+    def publish(self, base_dir: str = ANN_INDEX_DIR) -> None:
+        """Write the current snapshot as a new on-disk version (building an IVF
+        index for large corpora) and switch this process to the mapped copy."""
+        snap = self._snapshot
+        if snap is None:
+            return
+        with ann_index.exclusive(base_dir):
+            self._save(snap, base_dir)
+
+    def _save(self, snap: _Snapshot, base_dir: str) -> None:
+        # snap.ivf, when set, must already describe snap's row order
+        if snap.ivf is None and len(snap) >= ANN_MIN_ROWS:
+            ivf, order = ann_index.IVFIndex.train(snap.matrix)
+            snap = snap.take(order, ivf)
+        meta = {
+            "stamp": list(snap.stamp),
+            "rows": len(snap),
+            "doc_ids": snap.doc_ids.tolist(),
+            "source_types": snap.source_types.tolist(),
+            "source_ids": snap.source_ids.tolist(),
+            "versions": snap.versions.tolist(),
+        }
+        path = ann_index.save(base_dir, snap.matrix, snap.ivf, meta, snap.texts)
+        self._install(self._read(path))
+
+    def _read(self, path: str) -> _Snapshot:
+        matrix, ivf, meta, texts = ann_index.load(path)
+        return _Snapshot(
+            matrix=matrix,
+            doc_ids=np.array(meta["doc_ids"], dtype=np.int64),
+            source_types=np.array(meta["source_types"], dtype=object),
+            source_ids=np.array(meta["source_ids"], dtype=object),
+            texts=texts,
+            versions=np.array(meta.get("versions", [0] * meta["rows"]), dtype=np.int64),
+            stamp=tuple(meta["stamp"]),
+            ivf=ivf,
+        )
+
+    def _published(self, base_dir: str) -> Optional[_Snapshot]:
+        path = ann_index.current_path(base_dir)
+        if path is None:
+            return None
+        try:
+            return self._read(path)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def load_published(self, stamp: tuple, base_dir: str = ANN_INDEX_DIR) -> bool:
+        snap = self._published(base_dir)
+        if snap is None or snap.stamp != stamp:
+            return False
+        self._install(snap)
+        return True
+
+    def refresh(self, session: Session, base_dir: str = ANN_INDEX_DIR) -> None:
+        """Bring the published version up to date with embedding_documents by
+        re-reading only the rows added or changed since it was built, publish
+        the result and map it. New rows join their nearest IVF cluster; a
+        reindex retrains the clusters."""
+        with ann_index.exclusive(base_dir):
+            # Taken before the rows are read: anything committed later moves it again
+            stamp = self._stamp(session)
+            base = self._published(base_dir)
+            if base is not None and base.stamp == stamp:
+                self._install(base)
+                return
+            if base is None or base.matrix.shape[1] == 0:
+                kept, matrix = _fetch(session)
+                self._save(_snapshot(kept, matrix, stamp), base_dir)
+                return
+            known = dict(zip(base.doc_ids.tolist(), base.versions.tolist()))
+            live = dict(session.exec(select(EmbeddingDocument.id, EmbeddingDocument.updated_at)).all())
+            changed = [doc_id for doc_id, updated_at in live.items() if known.get(doc_id) != row_version(updated_at)]
+            drop = set(changed)
+            keep = np.array([i for i, d in enumerate(base.doc_ids.tolist()) if d in live and d not in drop], dtype=np.int64)
+            kept, matrix = _fetch(session, changed, dim=base.matrix.shape[1])
+            added = _snapshot(kept, matrix, stamp)
+            old = base.take(keep)
+            merged = _Snapshot(
+                matrix=np.concatenate([old.matrix, added.matrix]),
+                doc_ids=np.concatenate([old.doc_ids, added.doc_ids]),
+                source_types=np.concatenate([old.source_types, added.source_types]),
+                source_ids=np.concatenate([old.source_ids, added.source_ids]),
+                texts=list(old.texts) + list(added.texts),
+                versions=np.concatenate([old.versions, added.versions]),
+                stamp=stamp,
+            )
+            if base.ivf is not None:
+                ivf, order = base.ivf.regroup(np.concatenate([base.ivf.row_clusters()[keep], base.ivf.assign(added.matrix)]))
+                merged = merged.take(order, ivf)
+            self._save(merged, base_dir)
+
+    def ensure_fresh(self, session: Session, stamp: Optional[tuple] = None) -> None:
+        # Cheap aggregate check so every worker picks up a reindex done elsewhere
+        snap = self._snapshot
+        stamp = stamp if stamp is not None else self._stamp(session)
+        if snap is not None and snap.stamp == stamp:
+            return
+        if not self.load_published(stamp):
+            # Another worker may be mid-write; patch the published version rather than read everything
+            self.refresh(session)
+
+    @property
+    def version(self) -> Optional[tuple]:
+        snap = self._snapshot
+        return snap.stamp if snap is not None else None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+    def __len__(self):
+        snap = self._snapshot
+        return len(snap) if snap is not None else 0
+
+    def count(self, source_types: Optional[Sequence[str]] = None) -> int:
+        snap = self._snapshot
+        if snap is None:
+            return 0
+        if source_types is None:
+            return len(snap)
+        return int(snap.rows_of(source_types).shape[0])
+
+    def search(self, query: Sequence[float], k: int = 5, source_types: Optional[Sequence[str]] = None, min_score: float = 0.0) -> List[dict]:
+        snap = self._snapshot
+        if snap is None or len(snap) == 0:
+            return []
+        q = _normalize(query)
+        if q is None or q.shape[0] != snap.matrix.shape[1]:
+            return []
+        allowed = snap.rows_of(source_types) if source_types is not None else None
+        if allowed is not None and allowed.shape[0] < ANN_MIN_ROWS:
+            # A narrow slice (e.g. knowledge only) is cheaper to score exactly
+            return self._top_k(snap, allowed, q, k, min_score)
+        if snap.ivf is None:
+            return self._top_k(snap, allowed, q, k, min_score)
+        # Widen the probe until the clusters hold k rows of the wanted types;
+        # min_score filtering afterwards is not a reason to look further
+        nprobe = ANN_NPROBE
+        while True:
+            rows = snap.ivf.candidates(q, nprobe)
+            if allowed is not None:
+                rows = rows[np.isin(rows, allowed, assume_unique=True)]
+            if rows.shape[0] >= k or nprobe >= snap.ivf.nlist:
+                return self._top_k(snap, rows, q, k, min_score)
+            nprobe *= 2
+
+    def _top_k(self, snap: _Snapshot, rows: Optional[np.ndarray], q: np.ndarray, k: int, min_score: float) -> List[dict]:
+        scores = snap.matrix @ q if rows is None else snap.matrix[rows] @ q
+        if scores.shape[0] == 0:
+            return []
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        hits = []
+        for i in top:
+            s = float(scores[i])
+            if not s > min_score:
+                break
+            row = i if rows is None else rows[i]
+            hits.append({
+                "score": s,
+                "doc_id": int(snap.doc_ids[row]),
+                "source_type": snap.source_types[row],
+                "source_id": snap.source_ids[row],
+                "text": snap.texts[row],
+            })
+        return hits
+
+index = VectorIndex()
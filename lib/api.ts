@@ -52,3 +52,34 @@ export const fetcher = async (url: string, options: RequestInit = {}) => {
 
   return response.json();
 };
+
+// Public catalog data published as static JSON by the backend. The manifest
+// maps names like "categories" or "products/<slug>" to content-hashed files;
+// anything missing falls back to the API.
+type CatalogManifest = { version: string; files: Record<string, { url: string }> };
+
+let manifestRequest: Promise<CatalogManifest | null> | null = null;
+let manifestFetchedAt = 0;
+const MANIFEST_MAX_AGE_MS = 30_000;
+
+const getCatalogManifest = () => {
+  if (!manifestRequest || Date.now() - manifestFetchedAt > MANIFEST_MAX_AGE_MS) {
+    manifestFetchedAt = Date.now();
+    manifestRequest = fetch(`${API_URL}/static/catalog/manifest.json`, { cache: 'no-cache' })
+      .then((res) => (res.ok ? res.json() : null))
+      .catch(() => null);
+  }
+  return manifestRequest;
+};
+
+export const fetchPublished = async (name: string, fallbackUrl: string) => {
+  const manifest = await getCatalogManifest();
+  const entry = manifest?.files[name];
+  if (entry) {
+    const res = await fetch(`${API_URL}${entry.url}`).catch(() => null);
+    if (res && res.ok) {
+      return res.json();
+    }
+  }
+  return fetcher(fallbackUrl);
+};